@@ -1,28 +1,51 @@
 import csv
 import io
+import json
+import math
 import os
-from collections import defaultdict
-from datetime import date, datetime
-from functools import wraps
+import re
+import zlib
+from calendar import monthrange
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from functools import partial, wraps
 from statistics import mean
-from typing import Dict, List, Optional, Sequence, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 from urllib.parse import quote_plus
+from uuid import uuid4
 
-from flask import Flask, Response, g, jsonify, request
+from flask import Flask, Response, current_app, g, has_app_context, jsonify, request, send_file
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
-from sqlalchemy import extract, inspect, text
-from werkzeug.security import check_password_hash, generate_password_hash
+from sqlalchemy import Integer, case, cast, event, extract, func, inspect, literal, select, text
+from sqlalchemy.orm import Session
+
+from db_routing import ReplicaRouter, RoutingSession
+from fx import FxRates, load_fx_rates
+from jobs import JOB_DONE, JOB_QUEUED, JobQueue
+from passwords import PasswordHasher, PasswordHasherBusy
+from sharding import (
+    ShardMoveInProgress,
+    ShardRouter,
+    current_shard_user,
+    parse_shard_urls,
+    shard_context,
+    shard_metadata,
+)
+from sqlite_profile import SQLITE_PRODUCTION_PRAGMAS, GroupCommitWriter, configure_sqlite_engine
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 FRONTEND_DIR = os.path.abspath(os.path.join(BASE_DIR, "../frontend"))
 DATABASE_PATH = os.path.join(BASE_DIR, "expenses.db")
+FX_RATES_PATH = os.getenv("FX_RATES_PATH", os.path.join(BASE_DIR, "fx_rates.csv"))
+DEFAULT_CURRENCY = "INR"
+JOB_RESULT_DIR = os.getenv("JOB_RESULT_DIR", os.path.join(BASE_DIR, "job_results"))
 DEFAULT_SECRET = os.getenv("SECRET_KEY", "dev-secret-key")
 TOKEN_TTL_SECONDS = 60 * 60 * 24 * 7  # 7 days
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 class User(db.Model):
@@ -45,6 +68,10 @@ class User(db.Model):
 
 class Expense(db.Model):
     __tablename__ = "expenses"
+    __table_args__ = (
+        db.Index("ix_expenses_user_version", "user_id", "version"),
+        db.Index("ix_expenses_user_category_date", "user_id", "category", "date"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -52,7 +79,11 @@ class Expense(db.Model):
     category = db.Column(db.String(80), nullable=False)
     description = db.Column(db.String(255))
     date = db.Column(db.Date, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY, server_default=DEFAULT_CURRENCY)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    recurring_series_id = db.Column(db.Integer, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=0)
 
     user = db.relationship(User, backref=db.backref("expenses", lazy=True))
 
@@ -64,6 +95,151 @@ class Expense(db.Model):
             "category": self.category,
             "description": self.description or "",
             "date": self.date.isoformat(),
+            "currency": self.currency or DEFAULT_CURRENCY,
+            "recurring_series_id": self.recurring_series_id,
+            "version": self.version,
+        }
+
+
+class SyncVersion(db.Model):
+    """Per-user change counter; every transaction that touches a user's expenses bumps it once."""
+
+    __tablename__ = "sync_versions"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ExpenseTombstone(db.Model):
+    __tablename__ = "expense_tombstones"
+    __table_args__ = (db.Index("ix_expense_tombstones_user_version", "user_id", "version"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    expense_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Job(db.Model):
+    """Background job row; see :mod:`jobs` for the worker side."""
+
+    __tablename__ = "jobs"
+    __table_args__ = (db.Index("ix_jobs_status_created", "status", "created_at"),)
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    kind = db.Column(db.String(32), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default=JOB_QUEUED)
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    params = db.Column(db.Text)
+    result = db.Column(db.Text)
+    result_path = db.Column(db.String(512))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "result": json.loads(self.result) if self.result else None,
+            "resultUrl": f"/jobs/{self.id}/result" if self.result_path and self.status == JOB_DONE else None,
+            "error": self.error,
+            "createdAt": self.created_at.isoformat() if self.created_at else None,
+            "startedAt": self.started_at.isoformat() if self.started_at else None,
+            "finishedAt": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class ShardAssignment(db.Model):
+    """Directory override: users pinned to a shard other than (or regardless of) their ring slot."""
+
+    __tablename__ = "shard_directory"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    shard = db.Column(db.String(64), nullable=False)
+    # Set while reshard.py copies the user's rows; every process refuses their writes meanwhile.
+    moving = db.Column(db.Boolean, nullable=False, default=False)
+
+
+RECURRING_AMOUNT_TOLERANCE = 0.1
+RECURRING_MIN_OCCURRENCES = 3
+RECURRING_MIN_SIMILARITY = 0.5
+RECURRING_MAX_GAP_DAYS = 400
+RECURRING_PERIODS = {
+    "weekly": 7.0,
+    "biweekly": 14.0,
+    "monthly": 30.44,
+    "quarterly": 91.31,
+    "yearly": 365.25,
+}
+
+
+class RecurringSeries(db.Model):
+    """A run of expenses with a stable amount, category, description and cadence.
+
+    A row is written once a second matching expense turns up (unmatched expenses stay without a
+    series) and is only reported once it reaches ``RECURRING_MIN_OCCURRENCES``.
+    """
+
+    __tablename__ = "recurring_series"
+    __table_args__ = (db.Index("ix_recurring_series_lookup", "user_id", "category", "amount_bucket"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    category = db.Column(db.String(80), nullable=False)
+    description = db.Column(db.String(255))
+    description_key = db.Column(db.String(255), nullable=False, default="")
+    amount_bucket = db.Column(db.Integer, nullable=False)
+    mean_amount = db.Column(db.Float, nullable=False)
+    occurrences = db.Column(db.Integer, nullable=False, default=1)
+    period_days = db.Column(db.Float)
+    first_date = db.Column(db.Date, nullable=False)
+    last_date = db.Column(db.Date, nullable=False)
+
+    @property
+    def is_confirmed(self) -> bool:
+        return self.occurrences >= RECURRING_MIN_OCCURRENCES and bool(self.period_days)
+
+    @property
+    def cadence(self) -> str:
+        if not self.period_days:
+            return "unknown"
+        return min(RECURRING_PERIODS, key=lambda name: abs(RECURRING_PERIODS[name] - self.period_days))
+
+    @property
+    def monthly_amount(self) -> float:
+        if not self.period_days:
+            return 0.0
+        return self.mean_amount * RECURRING_PERIODS["monthly"] / self.period_days
+
+    def next_expected(self) -> Optional[date]:
+        if not self.period_days:
+            return None
+        return date.fromordinal(self.last_date.toordinal() + int(round(self.period_days)))
+
+    def is_active(self, today: date) -> bool:
+        return self.is_confirmed and (today - self.last_date).days <= self.period_days * 1.5
+
+    def to_dict(self) -> Dict:
+        next_expected = self.next_expected()
+        return {
+            "id": self.id,
+            "category": self.category,
+            "description": self.description or "",
+            "amount": round(self.mean_amount, 2),
+            "cadence": self.cadence,
+            "periodDays": round(self.period_days, 1) if self.period_days else None,
+            "occurrences": self.occurrences,
+            "firstDate": self.first_date.isoformat(),
+            "lastDate": self.last_date.isoformat(),
+            "nextExpected": next_expected.isoformat() if next_expected else None,
+            "monthlyAmount": round(self.monthly_amount, 2),
+            "active": self.is_active(date.today()),
         }
 
 
@@ -84,6 +260,19 @@ def build_database_uri() -> str:
     return f"sqlite:///{DATABASE_PATH}"
 
 
+def build_shard_uris() -> Dict[str, str]:
+    return parse_shard_urls(os.getenv("SHARD_DATABASE_URLS", ""))
+
+
+def build_admin_emails() -> List[str]:
+    return [email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()]
+
+
+def build_replica_uris() -> List[str]:
+    replicas = os.getenv("DATABASE_REPLICA_URLS", "")
+    return [url.strip() for url in replicas.split(",") if url.strip()]
+
+
 def parse_iso_date(value: Optional[str]) -> Optional[date]:
     if not value:
         return None
@@ -112,14 +301,976 @@ def apply_filters(query, user_id: int, start_date: Optional[date], end_date: Opt
     return query
 
 
-def aggregate_monthly_expenses(expenses: Sequence[Expense]) -> List[Tuple[str, float]]:
+EXPORT_BATCH_SIZE = 1000
+
+
+def export_header(currency: str) -> List[str]:
+    return ["id", "date", "category", "description", "amount", "currency", f"amount_{currency.lower()}"]
+
+
+def export_row(expense: Expense, rates: FxRates, currency: str) -> List:
+    source = expense.currency or DEFAULT_CURRENCY
+    return [
+        expense.id,
+        expense.date.isoformat(),
+        expense.category,
+        expense.description or "",
+        f"{expense.amount:.2f}",
+        source,
+        f"{rates.convert(expense.amount, source, currency, expense.date):.2f}",
+    ]
+
+
+def converted_rows(query, key_columns: Sequence, rates: FxRates, currency: str):
+    """Yield ``(*key, day, amount)`` with amounts summed per key and day, converted to ``currency``.
+
+    The database sums per key, stored currency and day, so each group costs one memoized rate
+    lookup instead of one per expense, and groups already in ``currency`` are not converted.
+    """
+    columns = [*key_columns, Expense.currency, Expense.date]
+    for *key, source, day, amount in query.with_entities(*columns, func.sum(Expense.amount)).group_by(*columns):
+        source = source or DEFAULT_CURRENCY
+        yield (*key, day, amount if source == currency else amount * rates.factor(source, currency, day))
+
+
+def aggregate_monthly_expenses(rows) -> List[Tuple[str, float]]:
+    """Monthly totals from ``(*key, day, amount)`` rows as produced by :func:`converted_rows`."""
     monthly_totals: Dict[str, float] = defaultdict(float)
-    for exp in expenses:
-        key = exp.date.strftime("%Y-%m")
-        monthly_totals[key] += exp.amount
+    for *_, day, amount in rows:
+        monthly_totals[day.strftime("%Y-%m")] += amount
     return sorted(monthly_totals.items())
 
 
+BUDGET_ALERT_THRESHOLDS = (80, 100)
+
+
+class CategoryMonthTotal(db.Model):
+    """Running spend per user, category and month, kept current on every expense flush."""
+
+    __tablename__ = "category_month_totals"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    category = db.Column(db.String(80), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class AppSetting(db.Model):
+    """Instance-wide key/value state, e.g. the currency the running totals were built in."""
+
+    __tablename__ = "app_settings"
+
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.String(255), nullable=False)
+
+
+class ExpenseArchive(db.Model):
+    """One finalized month of a user's expenses, moved out of the hot ``expenses`` table.
+
+    ``payload`` holds the rows as zlib-compressed columnar JSON. ``summary`` keeps totals per
+    category, currency and day, so stats over archived months never decompress the payload.
+    ``version`` is the highest sync version among the rows, so deltas only unpack partitions that
+    changed since the client's version.
+    """
+
+    __tablename__ = "expense_archives"
+    __table_args__ = (db.UniqueConstraint("user_id", "month", name="uq_expense_archives_user_month"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    month = db.Column(db.String(7), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    payload = db.Column(db.LargeBinary(length=2**24), nullable=False)
+    summary = db.Column(db.Text(length=2**24), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Budget(db.Model):
+    __tablename__ = "budgets"
+    __table_args__ = (db.UniqueConstraint("user_id", "category", name="uq_budget_user_category"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    category = db.Column(db.String(80), nullable=False)
+    monthly_limit = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class BudgetAlert(db.Model):
+    __tablename__ = "budget_alerts"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "category", "month", "threshold", name="uq_budget_alert_crossing"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    category = db.Column(db.String(80), nullable=False)
+    month = db.Column(db.String(7), nullable=False)
+    threshold = db.Column(db.Integer, nullable=False)
+    spent = db.Column(db.Float, nullable=False)
+    monthly_limit = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self) -> Dict:
+        if self.threshold >= 100:
+            message = f"{self.category} budget exceeded for {self.month}."
+        else:
+            message = f"{self.category} spending reached {self.threshold}% of the {self.month} budget."
+        return {
+            "id": self.id,
+            "category": self.category,
+            "month": self.month,
+            "threshold": self.threshold,
+            "spent": round(self.spent, 2),
+            "limit": round(self.monthly_limit, 2),
+            "message": message,
+            "createdAt": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+def committed_value(instance, attribute: str):
+    """Value an attribute had when the instance was loaded, ignoring pending edits."""
+    history = inspect(instance).attrs[attribute].history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else getattr(instance, attribute)
+
+
+def rollup_amount(amount: float, currency: Optional[str], on: date) -> float:
+    """Amount in the app's ``REPORTING_CURRENCY``, the currency of running totals and budgets."""
+    rates = current_app.extensions.get("fx_rates") if has_app_context() else None
+    if rates is None:
+        return amount
+    return rates.convert(amount, currency or DEFAULT_CURRENCY, current_app.config["REPORTING_CURRENCY"], on)
+
+
+ROLLUP_ATTRIBUTES = ("user_id", "category", "date", "amount", "currency")
+
+
+def expense_rollup_deltas(session) -> Dict[Tuple[int, str, str], List[float]]:
+    deltas: Dict[Tuple[int, str, str], List[float]] = defaultdict(lambda: [0.0, 0])
+
+    def add(user_id, category, expense_date, amount, currency, count):
+        delta = deltas[(user_id, category, expense_date.strftime("%Y-%m"))]
+        delta[0] += count * rollup_amount(amount, currency, expense_date)
+        delta[1] += count
+
+    for instance in session.new:
+        if isinstance(instance, Expense):
+            add(instance.user_id, instance.category, instance.date, instance.amount, instance.currency, 1)
+    for instance in session.deleted:
+        if isinstance(instance, Expense):
+            add(*(committed_value(instance, attr) for attr in ROLLUP_ATTRIBUTES), -1)
+    for instance in session.dirty:
+        if isinstance(instance, Expense) and session.is_modified(instance):
+            old = [committed_value(instance, attr) for attr in ROLLUP_ATTRIBUTES]
+            new = [getattr(instance, attr) for attr in ROLLUP_ATTRIBUTES]
+            if old != new:
+                add(*old, -1)
+                add(*new, 1)
+    return {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+
+
+def apply_rollup_delta(session, key: Tuple[int, str, str], amount: float, count: int) -> float:
+    """Atomically bump one running total and return the new value."""
+    user_id, category, month = key
+    table = CategoryMonthTotal.__table__
+    match = (table.c.user_id == user_id) & (table.c.category == category) & (table.c.month == month)
+    bind = {"mapper": inspect(CategoryMonthTotal)}
+    result = session.execute(
+        table.update().where(match).values(total=table.c.total + amount, count=table.c.count + count),
+        bind_arguments=bind,
+    )
+    if result.rowcount == 0:
+        session.execute(
+            table.insert().values(user_id=user_id, category=category, month=month, total=amount, count=count),
+            bind_arguments=bind,
+        )
+        return amount
+    return session.execute(select(table.c.total).where(match), bind_arguments=bind).scalar()
+
+
+def record_budget_alerts(session, key: Tuple[int, str, str], spent: float, previous: float):
+    user_id, category, month = key
+    budget = session.query(Budget).filter_by(user_id=user_id, category=category).first()
+    if budget is None:
+        return
+    for threshold in BUDGET_ALERT_THRESHOLDS:
+        line = budget.monthly_limit * threshold / 100.0
+        if previous < line <= spent:
+            exists = (
+                session.query(BudgetAlert.id)
+                .filter_by(user_id=user_id, category=category, month=month, threshold=threshold)
+                .first()
+            )
+            if not exists:
+                session.add(
+                    BudgetAlert(
+                        user_id=user_id,
+                        category=category,
+                        month=month,
+                        threshold=threshold,
+                        spent=spent,
+                        monthly_limit=budget.monthly_limit,
+                    )
+                )
+
+
+def next_sync_version(session, user_id: int) -> int:
+    """Bump and return the user's change version.
+
+    The row-level ``UPDATE`` also serialises concurrent writers for the same user until commit,
+    so versions become visible in increasing order and a client never skips one. It is the first
+    write of a transaction's first expense flush (``stamp_expense_versions`` is registered before
+    ``maintain_expense_rollups``), so a :func:`lock_sync_version` holder keeps writers out of the
+    running totals too.
+    """
+    table = SyncVersion.__table__
+    bind = {"mapper": inspect(SyncVersion)}
+    result = session.execute(
+        table.update().where(table.c.user_id == user_id).values(version=table.c.version + 1),
+        bind_arguments=bind,
+    )
+    if result.rowcount == 0:
+        session.execute(table.insert().values(user_id=user_id, version=1), bind_arguments=bind)
+        return 1
+    return session.execute(select(table.c.version).where(table.c.user_id == user_id), bind_arguments=bind).scalar()
+
+
+def lock_sync_version(session, user_id: int):
+    """Take the row lock :func:`next_sync_version` takes, without bumping the version."""
+    table = SyncVersion.__table__
+    bind = {"mapper": inspect(SyncVersion)}
+    result = session.execute(
+        table.update().where(table.c.user_id == user_id).values(version=table.c.version), bind_arguments=bind
+    )
+    if result.rowcount == 0:
+        session.execute(table.insert().values(user_id=user_id, version=0), bind_arguments=bind)
+
+
+def current_sync_version(user_id: int) -> int:
+    return db.session.query(SyncVersion.version).filter(SyncVersion.user_id == user_id).scalar() or 0
+
+
+@event.listens_for(Session, "before_flush")
+def stamp_expense_versions(session, flush_context, instances):
+    """Stamp changed expenses with the next change version and leave tombstones for deletes."""
+    changed = [
+        instance
+        for instance in list(session.new) + [obj for obj in session.dirty if session.is_modified(obj)]
+        if isinstance(instance, Expense)
+    ]
+    deleted = [instance for instance in session.deleted if isinstance(instance, Expense)]
+    # One version per transaction: later flushes (e.g. the series link after an insert) reuse it.
+    versions: Dict[int, int] = session.info.setdefault("sync_versions", {})
+    for user_id in {expense.user_id for expense in changed} | {committed_value(e, "user_id") for e in deleted}:
+        if user_id not in versions:
+            versions[user_id] = next_sync_version(session, user_id)
+    now = datetime.utcnow()
+    for expense in changed:
+        expense.version = versions[expense.user_id]
+        expense.updated_at = now
+    for expense in deleted:
+        user_id = committed_value(expense, "user_id")
+        session.add(ExpenseTombstone(user_id=user_id, expense_id=expense.id, version=versions[user_id], deleted_at=now))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def forget_sync_versions(session, transaction):
+    """Drop the cached versions when a transaction or savepoint ends; a rolled-back bump is gone.
+
+    Each flush runs in a subtransaction of its own, which must keep the cache.
+    """
+    if transaction.nested or transaction.parent is None:
+        session.info.pop("sync_versions", None)
+
+
+@event.listens_for(Session, "before_flush")
+def maintain_expense_rollups(session, flush_context, instances):
+    """Keep ``category_month_totals`` in step with expense writes and raise budget alerts.
+
+    Each create/update/delete turns into at most two constant-time upserts, so budget checks never
+    have to re-sum a month.
+    """
+    for key, (amount, count) in expense_rollup_deltas(session).items():
+        spent = apply_rollup_delta(session, key, amount, count)
+        if amount > 0:
+            record_budget_alerts(session, key, spent, spent - amount)
+
+
+def rebuild_category_totals(user_id: Optional[int] = None):
+    """Recompute running totals from the expenses table and archive summaries (backfill or repair).
+
+    While writes may run concurrently, hold :func:`lock_sync_version` for the user first, so an
+    expense committed between the read and the rewrite can't have its delta wiped.
+    """
+    totals = CategoryMonthTotal.query
+    expenses = db.session.query(Expense)
+    if user_id is not None:
+        totals = totals.filter(CategoryMonthTotal.user_id == user_id)
+        expenses = expenses.filter(Expense.user_id == user_id)
+    # Grouped per day and currency so each group converts with the rate of its own date, exactly
+    # as the incremental path in ``expense_rollup_deltas`` does.
+    columns = (Expense.user_id, Expense.category, Expense.currency, Expense.date)
+    grouped: Dict[Tuple[int, str, str], List[float]] = defaultdict(lambda: [0.0, 0])
+    for uid, category, currency, expense_date, amount, count in expenses.with_entities(
+        *columns, func.sum(Expense.amount), func.count(Expense.id)
+    ).group_by(*columns):
+        bucket = grouped[(uid, category, expense_date.strftime("%Y-%m"))]
+        bucket[0] += rollup_amount(amount, currency, expense_date)
+        bucket[1] += count
+    archives = db.session.query(ExpenseArchive.user_id, ExpenseArchive.summary)
+    if user_id is not None:
+        archives = archives.filter(ExpenseArchive.user_id == user_id)
+    for uid, summary in archives:
+        for category, currency, day, amount, count in json.loads(summary):
+            bucket = grouped[(uid, category, day[:7])]
+            bucket[0] += rollup_amount(amount, currency, date.fromisoformat(day))
+            bucket[1] += count
+    rows = [(*key, total, count) for key, (total, count) in grouped.items()]
+    totals.delete()
+    db.session.bulk_insert_mappings(
+        CategoryMonthTotal,
+        [
+            {"user_id": uid, "category": category, "month": key, "total": total, "count": count}
+            for uid, category, key, total, count in rows
+        ],
+    )
+
+
+def sync_rollup_currency(rates: FxRates, currency: str):
+    """Re-express running totals and budget limits when ``REPORTING_CURRENCY`` changes.
+
+    Totals are rebuilt from the expenses at each one's own date. Budget limits are plain numbers the
+    user typed, so they are converted at today's rate.
+    """
+    setting = db.session.get(AppSetting, "rollup_currency")
+    built_in = setting.value if setting is not None else DEFAULT_CURRENCY
+    if built_in != currency:
+        factor = rates.factor(built_in, currency, date.today())
+        for (user_id,) in db.session.query(User.id).order_by(User.id).all():
+            with shard_context(user_id):
+                lock_sync_version(db.session, user_id)
+                rebuild_category_totals(user_id)
+                for budget in Budget.query.filter(Budget.user_id == user_id):
+                    budget.monthly_limit = round(budget.monthly_limit * factor, 2)
+                db.session.commit()
+    if setting is None:
+        db.session.add(AppSetting(key="rollup_currency", value=currency))
+    elif built_in != currency:
+        setting.value = currency
+    db.session.commit()
+
+
+def budget_status(user_id: int, month: str) -> List[Dict]:
+    """Budgets joined with their running totals for one month: one indexed query, no re-summing."""
+    rows = (
+        db.session.query(Budget, CategoryMonthTotal.total)
+        .outerjoin(
+            CategoryMonthTotal,
+            (CategoryMonthTotal.user_id == Budget.user_id)
+            & (CategoryMonthTotal.category == Budget.category)
+            & (CategoryMonthTotal.month == month),
+        )
+        .filter(Budget.user_id == user_id)
+        .order_by(Budget.category)
+        .all()
+    )
+    statuses = []
+    for budget, spent in rows:
+        spent = round(spent or 0.0, 2)
+        percent = round(spent / budget.monthly_limit * 100, 1)
+        if percent >= 100:
+            state = "exceeded"
+        elif percent >= BUDGET_ALERT_THRESHOLDS[0]:
+            state = "warning"
+        else:
+            state = "ok"
+        statuses.append(
+            {
+                "id": budget.id,
+                "category": budget.category,
+                "limit": round(budget.monthly_limit, 2),
+                "spent": spent,
+                "remaining": round(budget.monthly_limit - spent, 2),
+                "percent": percent,
+                "status": state,
+            }
+        )
+    return statuses
+
+
+ARCHIVE_COLUMNS = ("id", "date", "category", "description", "amount", "currency", "recurring_series_id", "version")
+
+
+def pack_archive_rows(expenses: Sequence[Expense]) -> bytes:
+    columns: Dict[str, List] = {name: [] for name in ARCHIVE_COLUMNS}
+    for expense in expenses:
+        for name in ARCHIVE_COLUMNS:
+            # Series are replayed from hot rows only, so an archived row's series id would go stale.
+            value = None if name == "recurring_series_id" else getattr(expense, name)
+            columns[name].append(value.isoformat() if isinstance(value, date) else value)
+    return zlib.compress(json.dumps(columns, separators=(",", ":")).encode("utf-8"), 9)
+
+
+def unpack_archive_rows(payload: bytes, user_id: int) -> List[Expense]:
+    """Archived rows as transient ``Expense`` objects (never added to the session)."""
+    columns = json.loads(zlib.decompress(payload))
+    expenses = []
+    for values in zip(*(columns[name] for name in ARCHIVE_COLUMNS)):
+        row = dict(zip(ARCHIVE_COLUMNS, values))
+        row["date"] = date.fromisoformat(row["date"])
+        expenses.append(Expense(user_id=user_id, **row))
+    return expenses
+
+
+def summarize_archive_rows(expenses: Sequence[Expense]) -> str:
+    totals: Dict[Tuple[str, str, str], List[float]] = defaultdict(lambda: [0.0, 0])
+    for expense in expenses:
+        bucket = totals[(expense.category, expense.currency or DEFAULT_CURRENCY, expense.date.isoformat())]
+        bucket[0] += expense.amount
+        bucket[1] += 1
+    return json.dumps([[*key, total, count] for key, (total, count) in sorted(totals.items())])
+
+
+def archive_month_filters(user_id: int, start_date: Optional[date], end_date: Optional[date]) -> List:
+    filters = [ExpenseArchive.user_id == user_id]
+    if start_date:
+        filters.append(ExpenseArchive.month >= start_date.strftime("%Y-%m"))
+    if end_date:
+        filters.append(ExpenseArchive.month <= end_date.strftime("%Y-%m"))
+    return filters
+
+
+def in_filter_range(day: date, category: str, start_date, end_date, category_filter) -> bool:
+    return (
+        (not start_date or day >= start_date)
+        and (not end_date or day <= end_date)
+        and (not category_filter or category == category_filter)
+    )
+
+
+def archived_expenses(
+    user_id: int, start_date: Optional[date], end_date: Optional[date], category: Optional[str]
+) -> List[Expense]:
+    """Archived rows matching the same filters as :func:`apply_filters`; only overlapping months are unpacked."""
+    expenses = []
+    for (payload,) in db.session.query(ExpenseArchive.payload).filter(
+        *archive_month_filters(user_id, start_date, end_date)
+    ):
+        expenses.extend(
+            expense
+            for expense in unpack_archive_rows(payload, user_id)
+            if in_filter_range(expense.date, expense.category, start_date, end_date, category)
+        )
+    return expenses
+
+
+def archived_changes(user_id: int, since: int) -> List[Expense]:
+    """Archived rows stamped after ``since`` (every archived row when ``since`` is 0)."""
+    expenses = []
+    for (payload,) in db.session.query(ExpenseArchive.payload).filter(
+        ExpenseArchive.user_id == user_id, ExpenseArchive.version > since
+    ):
+        expenses.extend(expense for expense in unpack_archive_rows(payload, user_id) if expense.version > since)
+    return expenses
+
+
+def archived_converted_rows(
+    user_id: int,
+    start_date: Optional[date],
+    end_date: Optional[date],
+    category: Optional[str],
+    rates: FxRates,
+    currency: str,
+):
+    """Same ``(category, day, amount)`` rows as :func:`converted_rows`, read from archive summaries."""
+    for expense_category, source, day, amount, _ in archived_summary_rows(user_id, start_date, end_date, category):
+        yield expense_category, day, rates.convert(amount, source, currency, day)
+
+
+def archived_summary_rows(
+    user_id: int, start_date: Optional[date], end_date: Optional[date], category: Optional[str]
+):
+    """``(category, currency, day, total, count)`` summary entries matching the filters."""
+    for (summary,) in db.session.query(ExpenseArchive.summary).filter(
+        *archive_month_filters(user_id, start_date, end_date)
+    ):
+        for expense_category, source, day, amount, count in json.loads(summary):
+            day = date.fromisoformat(day)
+            if in_filter_range(day, expense_category, start_date, end_date, category):
+                yield expense_category, source, day, amount, count
+
+
+def archived_analytics_groups(
+    user_id: int, start_date: Optional[date], end_date: Optional[date], category: Optional[str], exact: bool
+):
+    """Archived ``(day, category, currency, sum, count, min, max)`` groups for :func:`run_analytics`.
+
+    Summaries carry no min/max or single amounts, so ``exact`` unpacks the partitions and yields
+    one group per expense instead.
+    """
+    if exact:
+        for expense in archived_expenses(user_id, start_date, end_date, category):
+            amount = expense.amount
+            yield expense.date, expense.category, expense.currency, amount, 1, amount, amount
+        return
+    for expense_category, source, day, amount, count in archived_summary_rows(user_id, start_date, end_date, category):
+        yield day, expense_category, source, amount, count, math.inf, -math.inf
+
+
+SHARDED_TABLES = (
+    "expenses",
+    "expense_archives",
+    "recurring_series",
+    "category_month_totals",
+    "budgets",
+    "budget_alerts",
+    "sync_versions",
+    "expense_tombstones",
+)
+
+
+def description_key(description: Optional[str]) -> str:
+    """Normalise a description to its sorted word set (digits dropped, so invoice numbers don't matter)."""
+    return " ".join(sorted(set(re.findall(r"[a-z]+", (description or "").lower()))))
+
+
+def description_similarity(left: str, right: str) -> float:
+    left_tokens, right_tokens = set(left.split()), set(right.split())
+    if not left_tokens and not right_tokens:
+        return 1.0
+    return len(left_tokens & right_tokens) / len(left_tokens | right_tokens)
+
+
+def amount_bucket(amount: float) -> int:
+    """Log-scale bucket whose width equals the amount tolerance, so matches live in adjacent buckets."""
+    return int(math.floor(math.log(max(amount, 0.01)) / math.log(1 + RECURRING_AMOUNT_TOLERANCE)))
+
+
+def period_tolerance(period: float) -> float:
+    return max(3.0, period * 0.15)
+
+
+def gap_fits_series(series: RecurringSeries, gap: int) -> bool:
+    if series.period_days:
+        return abs(gap - series.period_days) <= period_tolerance(series.period_days)
+    return any(abs(gap - period) <= period_tolerance(period) for period in RECURRING_PERIODS.values())
+
+
+def best_series_match(expense: Expense, key: str, candidates) -> Tuple[Optional[RecurringSeries], bool]:
+    """Pick the candidate series ``expense`` continues; the flag is set when it predates one."""
+    best, best_score = None, None
+    for series in candidates:
+        gap = (expense.date - series.last_date).days
+        if gap > RECURRING_MAX_GAP_DAYS:
+            continue
+        drift = abs(expense.amount - series.mean_amount) / series.mean_amount
+        similarity = description_similarity(key, series.description_key)
+        if drift > RECURRING_AMOUNT_TOLERANCE or similarity < RECURRING_MIN_SIMILARITY:
+            continue
+        if gap < 0:
+            return None, True
+        if gap == 0 or not gap_fits_series(series, gap):
+            continue
+        score = similarity - drift + series.occurrences * 0.01
+        if best_score is None or score > best_score:
+            best, best_score = series, score
+    return best, False
+
+
+def start_series(expense: Expense, key: str) -> RecurringSeries:
+    return RecurringSeries(
+        user_id=expense.user_id,
+        category=expense.category,
+        description=expense.description,
+        description_key=key,
+        amount_bucket=amount_bucket(expense.amount),
+        mean_amount=expense.amount,
+        occurrences=1,
+        first_date=expense.date,
+        last_date=expense.date,
+    )
+
+
+def extend_series(series: RecurringSeries, expense: Expense):
+    gap = (expense.date - series.last_date).days
+    gaps_seen = series.occurrences - 1
+    series.period_days = gap if not series.period_days else (series.period_days * gaps_seen + gap) / (gaps_seen + 1)
+    series.mean_amount = (series.mean_amount * series.occurrences + expense.amount) / (series.occurrences + 1)
+    series.occurrences += 1
+    series.last_date = expense.date
+    series.amount_bucket = amount_bucket(series.mean_amount)
+
+
+def observe_expense(expense: Expense) -> Optional[bool]:
+    """Fold one new expense into the user's recurring-series index.
+
+    Candidates are the stored series in the same category and neighbouring amount buckets, plus the
+    unmatched expenses within ``RECURRING_MAX_GAP_DAYS`` at a matching amount: a series row is only
+    written once a second occurrence turns up, so one-off purchases never add rows. Returns ``False``
+    when the expense predates a matching candidate and the caller needs :func:`rebuild_recurring_series`.
+    """
+    bucket = amount_bucket(expense.amount)
+    key = description_key(expense.description)
+    candidates = RecurringSeries.query.filter(
+        RecurringSeries.user_id == expense.user_id,
+        RecurringSeries.category == expense.category,
+        RecurringSeries.amount_bucket.in_([bucket - 1, bucket, bucket + 1]),
+    ).all()
+    window = timedelta(days=RECURRING_MAX_GAP_DAYS)
+    singletons: Dict[int, Expense] = {}
+    for other in Expense.query.filter(
+        Expense.user_id == expense.user_id,
+        Expense.category == expense.category,
+        Expense.date.between(expense.date - window, expense.date + window),
+        Expense.amount.between(
+            expense.amount / (1 + RECURRING_AMOUNT_TOLERANCE), expense.amount / (1 - RECURRING_AMOUNT_TOLERANCE)
+        ),
+        Expense.recurring_series_id.is_(None),
+        Expense.id != expense.id,
+    ):
+        candidate = start_series(other, description_key(other.description))
+        singletons[id(candidate)] = other
+        candidates.append(candidate)
+    best, predates = best_series_match(expense, key, candidates)
+    if predates:
+        return False
+    if best is None:
+        return True
+    extend_series(best, expense)
+    first = singletons.get(id(best))
+    if first is not None:
+        db.session.add(best)
+        db.session.flush()
+        first.recurring_series_id = best.id
+    expense.recurring_series_id = best.id
+    return True
+
+
+SERIES_FIELDS = (
+    "category",
+    "description",
+    "description_key",
+    "amount_bucket",
+    "mean_amount",
+    "occurrences",
+    "period_days",
+    "first_date",
+    "last_date",
+)
+
+
+def rebuild_recurring_series(user_id: int, category: Optional[str] = None):
+    """Replay a user's expenses (optionally one category) through the detector in date order.
+
+    The replay runs in memory. Each resulting series then reuses the existing row most of its members
+    already point at, and only expenses whose series really changed are written. An edit therefore
+    does not restamp (and resend through ``/expenses/changes``) the rest of the category.
+    """
+    expenses = Expense.query.filter(Expense.user_id == user_id)
+    existing = RecurringSeries.query.filter(RecurringSeries.user_id == user_id)
+    if category:
+        expenses = expenses.filter(Expense.category == category)
+        existing = existing.filter(RecurringSeries.category == category)
+
+    open_series: Dict[str, List[RecurringSeries]] = defaultdict(list)
+    members: Dict[int, List[Expense]] = defaultdict(list)
+    assignment: Dict[Expense, Optional[RecurringSeries]] = {}
+    for expense in expenses.order_by(Expense.date, Expense.id).all():
+        bucket = amount_bucket(expense.amount)
+        key = description_key(expense.description)
+        candidates = []
+        for series in list(open_series[expense.category]):
+            if series.occurrences == 1 and (expense.date - series.last_date).days > RECURRING_MAX_GAP_DAYS:
+                open_series[expense.category].remove(series)
+                for member in members.pop(id(series)):
+                    assignment[member] = None
+            elif abs(series.amount_bucket - bucket) <= 1:
+                candidates.append(series)
+        best, _ = best_series_match(expense, key, candidates)  # date order: nothing can predate
+        if best is None:
+            best = start_series(expense, key)
+            open_series[expense.category].append(best)
+        else:
+            extend_series(best, expense)
+        members[id(best)].append(expense)
+        assignment[expense] = best
+
+    replayed = [series for group in open_series.values() for series in group]
+    rows = {series.id: series for series in existing.all()}
+    resolved: Dict[int, RecurringSeries] = {}
+    for series in sorted(replayed, key=lambda item: -len(members[id(item)])):
+        if series.occurrences < 2:
+            continue
+        votes = Counter(
+            member.recurring_series_id for member in members[id(series)] if member.recurring_series_id in rows
+        )
+        row = rows.pop(votes.most_common(1)[0][0]) if votes else None
+        if row is None:
+            db.session.add(series)
+            row = series
+        else:
+            for field in SERIES_FIELDS:
+                if getattr(row, field) != getattr(series, field):
+                    setattr(row, field, getattr(series, field))
+        resolved[id(series)] = row
+    for stale in rows.values():
+        db.session.delete(stale)
+    db.session.flush()
+
+    for expense, series in assignment.items():
+        row = resolved.get(id(series)) if series is not None else None
+        series_id = row.id if row is not None else None
+        if expense.recurring_series_id != series_id:
+            expense.recurring_series_id = series_id
+
+
+def track_recurring(expense: Expense):
+    if not observe_expense(expense):
+        rebuild_recurring_series(expense.user_id, expense.category)
+
+
+ANALYTICS_DIMENSIONS = ("day", "week", "month", "year", "weekday", "category")
+ANALYTICS_SQL_METRICS = ("sum", "count", "avg", "min", "max")
+WEEKDAY_NAMES = ("Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday")
+SQL_ANALYTICS_DIALECTS = ("sqlite", "mysql")
+
+
+def parse_csv_param(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    return [item.strip().lower() for item in value.split(",") if item.strip()]
+
+
+def percentile_rank(metric: str) -> Optional[float]:
+    """Return the percentile (0-100) a metric name asks for, or None for plain aggregates."""
+    if metric == "median":
+        return 50.0
+    if len(metric) > 1 and metric[0] == "p":
+        try:
+            rank = float(metric[1:])
+        except ValueError:
+            return None
+        if 0 <= rank <= 100:
+            return rank
+    return None
+
+
+def parse_analytics_request(args) -> Tuple[List[str], List[str], Optional[str]]:
+    dimensions = parse_csv_param(args.get("group_by")) or ["month"]
+    metrics = parse_csv_param(args.get("metrics")) or ["sum", "count"]
+    for dimension in dimensions:
+        if dimension not in ANALYTICS_DIMENSIONS:
+            return [], [], f"Unsupported dimension '{dimension}'. Use one of: {', '.join(ANALYTICS_DIMENSIONS)}."
+    if len(set(dimensions)) != len(dimensions):
+        return [], [], "Each dimension may only be used once."
+    for metric in metrics:
+        if metric not in ANALYTICS_SQL_METRICS and percentile_rank(metric) is None:
+            return [], [], f"Unsupported metric '{metric}'. Use sum, count, avg, min, max, median or pNN."
+    return dimensions, metrics, None
+
+
+def dimension_expression(dimension: str, dialect: str):
+    """Build the SQL expression that buckets ``Expense.date``/``category`` for a dimension."""
+    if dimension == "category":
+        return Expense.category
+    if dialect == "mysql":
+        if dimension == "day":
+            return func.date_format(Expense.date, "%Y-%m-%d")
+        if dimension == "week":
+            return func.date_format(func.subdate(Expense.date, func.weekday(Expense.date)), "%Y-%m-%d")
+        if dimension == "month":
+            return func.date_format(Expense.date, "%Y-%m")
+        if dimension == "year":
+            return func.date_format(Expense.date, "%Y")
+        return func.dayofweek(Expense.date) - literal(1)
+    if dimension == "day":
+        return func.strftime("%Y-%m-%d", Expense.date)
+    if dimension == "week":
+        return func.date(Expense.date, "weekday 0", "-6 days")
+    if dimension == "month":
+        return func.strftime("%Y-%m", Expense.date)
+    if dimension == "year":
+        return func.strftime("%Y", Expense.date)
+    return cast(func.strftime("%w", Expense.date), Integer)
+
+
+def dimension_value(dimension: str, expense_date: date, category: str):
+    """Python twin of :func:`dimension_expression` used by the in-process path."""
+    if dimension == "category":
+        return category
+    if dimension == "day":
+        return expense_date.isoformat()
+    if dimension == "week":
+        return date.fromordinal(expense_date.toordinal() - expense_date.weekday()).isoformat()
+    if dimension == "month":
+        return expense_date.strftime("%Y-%m")
+    if dimension == "year":
+        return expense_date.strftime("%Y")
+    return expense_date.isoweekday() % 7
+
+
+def conversion_day(currency: str):
+    """``Expense.date`` for rows stored in another currency, NULL for rows already in ``currency``.
+
+    Grouping by it (next to ``Expense.currency``) splits foreign amounts per day, so each group
+    converts with one memoized rate lookup, while rows in ``currency`` stay in one group per key.
+    """
+    return case((Expense.currency == currency, None), else_=Expense.date)
+
+
+def group_factor(rates: FxRates, source: Optional[str], day: Optional[date], currency: str) -> float:
+    return 1.0 if day is None else rates.factor(source or DEFAULT_CURRENCY, currency, day)
+
+
+def fold_group(groups: Dict[Tuple, List[float]], key: Tuple, total: float, count: int, low: float, high: float):
+    group = groups.get(key)
+    if group is None:
+        groups[key] = [total, count, low, high]
+    else:
+        group[0] += total
+        group[1] += count
+        group[2] = min(group[2], low)
+        group[3] = max(group[3], high)
+
+
+def combine_metric(metric: str, total: float, count: int, low: float, high: float) -> float:
+    """Plain aggregates from per-group ``(sum, count, min, max)`` already converted to one currency."""
+    if metric == "sum":
+        return total
+    if metric == "count":
+        return count
+    if metric == "avg":
+        return total / count if count else 0.0
+    if metric == "min":
+        return low
+    return high
+
+
+def interpolated_percentile(sorted_values: Sequence[float], rank: float) -> float:
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * rank / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+def compute_metric(metric: str, amounts: List[float]) -> float:
+    if metric == "sum":
+        return sum(amounts)
+    if metric == "count":
+        return len(amounts)
+    if metric == "avg":
+        return sum(amounts) / len(amounts) if amounts else 0.0
+    if metric == "min":
+        return amounts[0]
+    if metric == "max":
+        return amounts[-1]
+    return interpolated_percentile(amounts, percentile_rank(metric))
+
+
+def format_analytics_row(dimensions: Sequence[str], keys: Sequence, metrics: Sequence[str], values: Sequence) -> Dict:
+    row: Dict = {}
+    for dimension, key in zip(dimensions, keys):
+        if dimension == "weekday":
+            key = WEEKDAY_NAMES[int(key)]
+        row[dimension] = key
+    for metric, value in zip(metrics, values):
+        row[metric] = int(value or 0) if metric == "count" else round(float(value or 0), 2)
+    return row
+
+
+def run_sql_analytics(
+    query,
+    dimensions: Sequence[str],
+    metrics: Sequence[str],
+    dialect: str,
+    rates: FxRates,
+    currency: str,
+    archived: Iterable[Tuple],
+) -> List[Dict]:
+    """Compile the whole breakdown into one ``GROUP BY`` so only result rows leave the database.
+
+    Groups are split by stored currency (and by day for foreign ones, see :func:`conversion_day`);
+    their sum/count/min/max are converted and folded per breakdown key here, together with the
+    ``archived`` groups from :func:`archived_analytics_groups`.
+    """
+    dimension_columns = [dimension_expression(dim, dialect).label(f"d_{dim}") for dim in dimensions]
+    group_columns = [*dimension_columns, Expense.currency, conversion_day(currency).label("fx_day")]
+    rows = query.with_entities(
+        *group_columns,
+        func.sum(Expense.amount),
+        func.count(Expense.id),
+        func.min(Expense.amount),
+        func.max(Expense.amount),
+    ).group_by(*group_columns)
+    width = len(dimensions)
+    groups: Dict[Tuple, List[float]] = {}
+    for row in rows:
+        key = tuple(row[:width])
+        source, day, total, count, low, high = row[width:]
+        factor = group_factor(rates, source, day, currency)
+        fold_group(groups, key, total * factor, count, low * factor, high * factor)
+    for day, category, source, total, count, low, high in archived:
+        key = tuple(dimension_value(dim, day, category) for dim in dimensions)
+        factor = rates.factor(source or DEFAULT_CURRENCY, currency, day)
+        fold_group(groups, key, total * factor, count, low * factor, high * factor)
+    return [
+        format_analytics_row(dimensions, key, metrics, [combine_metric(metric, *group) for metric in metrics])
+        for key, group in groups.items()
+    ]
+
+
+def run_inprocess_analytics(
+    query, dimensions: Sequence[str], metrics: Sequence[str], rates: FxRates, currency: str, archived: Iterable[Tuple]
+) -> List[Dict]:
+    """Fallback for percentiles (and dialects without date helpers).
+
+    Only the columns needed are fetched; amounts are converted (one memoized factor per currency
+    and day), bucketed per group and sorted once so every order statistic is an index lookup.
+    """
+    groups: Dict[Tuple, List[float]] = defaultdict(list)
+    for expense_date, category, amount, source in query.with_entities(
+        Expense.date, Expense.category, Expense.amount, Expense.currency
+    ):
+        key = tuple(dimension_value(dim, expense_date, category) for dim in dimensions)
+        groups[key].append(rates.convert(amount, source or DEFAULT_CURRENCY, currency, expense_date))
+    for expense_date, category, source, amount, *_ in archived:
+        key = tuple(dimension_value(dim, expense_date, category) for dim in dimensions)
+        groups[key].append(rates.convert(amount, source or DEFAULT_CURRENCY, currency, expense_date))
+    rows = []
+    for key, amounts in groups.items():
+        amounts.sort()
+        rows.append(format_analytics_row(dimensions, key, metrics, [compute_metric(m, amounts) for m in metrics]))
+    return rows
+
+
+def run_analytics(
+    query,
+    dimensions: Sequence[str],
+    metrics: Sequence[str],
+    dialect: str,
+    rates: FxRates,
+    currency: str,
+    archived_groups: Callable[[bool], Iterable[Tuple]],
+) -> List[Dict]:
+    """``archived_groups(exact)`` returns the archived groups (see :func:`archived_analytics_groups`)."""
+    needs_percentiles = any(metric not in ANALYTICS_SQL_METRICS for metric in metrics)
+    if dialect in SQL_ANALYTICS_DIALECTS and not needs_percentiles:
+        exact = any(metric in ("min", "max") for metric in metrics)
+        rows = run_sql_analytics(query, dimensions, metrics, dialect, rates, currency, archived_groups(exact))
+    else:
+        rows = run_inprocess_analytics(query, dimensions, metrics, rates, currency, archived_groups(True))
+    order = {name: idx for idx, name in enumerate(WEEKDAY_NAMES)}
+    rows.sort(key=lambda row: tuple(order[row[d]] if d == "weekday" else row[d] for d in dimensions))
+    return rows
+
+
 def create_app(config: Optional[Dict] = None):
     app = Flask(
         __name__,
@@ -130,11 +1281,78 @@ def create_app(config: Optional[Dict] = None):
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["SECRET_KEY"] = DEFAULT_SECRET
     app.config.setdefault("TOKEN_TTL_SECONDS", TOKEN_TTL_SECONDS)
+    app.config.setdefault("SPENDER_THRESHOLDS", (500, 1500))
+    app.config.setdefault("SQLALCHEMY_REPLICA_URIS", build_replica_uris())
+    app.config.setdefault("REPLICA_STICKY_SECONDS", 5.0)
+    app.config.setdefault("REPLICA_HEALTH_CHECK_SECONDS", 10.0)
+    app.config.setdefault("SHARD_DATABASE_URIS", build_shard_uris())
+    app.config.setdefault("SHARD_DIRECTORY_REFRESH_SECONDS", 5.0)
+    app.config.setdefault("ADMIN_EMAILS", build_admin_emails())
+    app.config.setdefault("JOB_WORKERS", int(os.getenv("JOB_WORKERS", "2")))
+    app.config.setdefault("JOB_POLL_SECONDS", 1.0)
+    app.config.setdefault("JOB_RESULT_DIR", JOB_RESULT_DIR)
+    app.config.setdefault("JOB_RESULT_TTL_SECONDS", float(os.getenv("JOB_RESULT_TTL_SECONDS", "86400")))
+    app.config.setdefault("SQLITE_PROFILE", os.getenv("SQLITE_PROFILE", "default"))
+    app.config.setdefault("SQLITE_PRAGMAS", {})
+    app.config.setdefault("SQLITE_GROUP_COMMIT_MAX_BATCH", 64)
+    app.config.setdefault("SQLITE_GROUP_COMMIT_WINDOW_SECONDS", 0.002)
+    app.config.setdefault("PASSWORD_HASH_METHOD", os.getenv("PASSWORD_HASH_METHOD", "scrypt"))
+    app.config.setdefault("PASSWORD_SALT_LENGTH", 16)
+    app.config.setdefault("PASSWORD_HASH_WORKERS", int(os.getenv("PASSWORD_HASH_WORKERS", "2")))
+    app.config.setdefault("PASSWORD_HASH_MAX_PENDING", 32)
+    app.config.setdefault("FX_RATES_PATH", FX_RATES_PATH)
+    app.config.setdefault("REPORTING_CURRENCY", os.getenv("REPORTING_CURRENCY", DEFAULT_CURRENCY))
+    app.config.setdefault("ARCHIVE_HORIZON_MONTHS", int(os.getenv("ARCHIVE_HORIZON_MONTHS", "24")))
     if config:
         app.config.update(config)
 
     CORS(app)
     db.init_app(app)
+    password_hasher = PasswordHasher(
+        method=app.config["PASSWORD_HASH_METHOD"],
+        salt_length=app.config["PASSWORD_SALT_LENGTH"],
+        workers=app.config["PASSWORD_HASH_WORKERS"],
+        max_pending=app.config["PASSWORD_HASH_MAX_PENDING"],
+    )
+    app.extensions["password_hasher"] = password_hasher
+    fx_rates = load_fx_rates(app.config["FX_RATES_PATH"])
+    app.extensions["fx_rates"] = fx_rates
+
+    def migrate_expense_columns(engine):
+        """Column additions for the sharded tables, on the primary and every shard (``create_all`` never alters)."""
+        expense_columns = {column["name"] for column in inspect(engine).get_columns("expenses")}
+        if "recurring_series_id" not in expense_columns:
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE expenses ADD COLUMN recurring_series_id INTEGER"))
+                conn.execute(
+                    text("CREATE INDEX ix_expenses_recurring_series_id ON expenses (recurring_series_id)")
+                )
+        if "version" not in expense_columns:
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE expenses ADD COLUMN updated_at DATETIME"))
+                conn.execute(text("ALTER TABLE expenses ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+                conn.execute(text("CREATE INDEX ix_expenses_user_version ON expenses (user_id, version)"))
+        if "currency" not in expense_columns:
+            with engine.begin() as conn:
+                conn.execute(
+                    text(f"ALTER TABLE expenses ADD COLUMN currency VARCHAR(3) NOT NULL DEFAULT '{DEFAULT_CURRENCY}'")
+                )
+        if "ix_expenses_user_category_date" not in {index["name"] for index in inspect(engine).get_indexes("expenses")}:
+            # Older schemas stored a series row per unmatched expense; those now live on the expense itself.
+            with engine.begin() as conn:
+                conn.execute(
+                    text("CREATE INDEX ix_expenses_user_category_date ON expenses (user_id, category, date)")
+                )
+                conn.execute(
+                    text(
+                        "UPDATE expenses SET recurring_series_id = NULL WHERE recurring_series_id IN "
+                        "(SELECT id FROM recurring_series WHERE occurrences < 2)"
+                    )
+                )
+                conn.execute(text("DELETE FROM recurring_series WHERE occurrences < 2"))
+        if "version" not in {column["name"] for column in inspect(engine).get_columns("expense_archives")}:
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE expense_archives ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
 
     def bootstrap_schema():
         inspector = inspect(db.engine)
@@ -147,7 +1365,7 @@ def create_app(config: Optional[Dict] = None):
                 default_user = User(
                     email="legacy@example.com",
                     username="legacy_user",
-                    password_hash=generate_password_hash("legacy123"),
+                    password_hash=password_hasher.hash("legacy123"),
                 )
                 db.session.add(default_user)
                 db.session.commit()
@@ -156,9 +1374,85 @@ def create_app(config: Optional[Dict] = None):
                     text("UPDATE expenses SET user_id = :uid WHERE user_id IS NULL OR user_id = 0"),
                     {"uid": default_user.id},
                 )
+        if "moving" not in {column["name"] for column in inspector.get_columns("shard_directory")}:
+            with db.engine.begin() as conn:
+                conn.execute(text("ALTER TABLE shard_directory ADD COLUMN moving BOOLEAN NOT NULL DEFAULT 0"))
+        for engine in [db.engine, *shard_engines()]:
+            migrate_expense_columns(engine)
+        if CategoryMonthTotal.query.first() is None and Expense.query.first() is not None:
+            rebuild_category_totals()
+            db.session.commit()
+        sync_rollup_currency(fx_rates, app.config["REPORTING_CURRENCY"])
+
+    if app.config["SHARD_DATABASE_URIS"]:
+
+        def load_shard_directory() -> Tuple[Dict[int, str], Set[int]]:
+            with app.app_context(), db.engine.connect() as conn:
+                rows = conn.execute(
+                    select(ShardAssignment.user_id, ShardAssignment.shard, ShardAssignment.moving)
+                ).all()
+            directory = {user_id: shard for user_id, shard, _ in rows}
+            return directory, {user_id for user_id, _, moving in rows if moving}
+
+        app.extensions["shard_router"] = ShardRouter(
+            app.config["SHARD_DATABASE_URIS"],
+            SHARDED_TABLES,
+            directory_loader=load_shard_directory,
+            directory_refresh_seconds=app.config["SHARD_DIRECTORY_REFRESH_SECONDS"],
+            engine_options=app.config.get("SQLALCHEMY_ENGINE_OPTIONS"),
+        )
+
+    def shard_engines() -> List:
+        shard_router = app.extensions.get("shard_router")
+        return list(shard_router.engines.values()) if shard_router else []
+
+    def configure_sqlite_profile():
+        if db.engine.dialect.name != "sqlite" or app.config["SQLITE_PROFILE"] != "production":
+            return
+        for engine in [db.engine, *shard_engines()]:
+            if engine.dialect.name == "sqlite":
+                configure_sqlite_engine(engine, {**SQLITE_PRODUCTION_PRAGMAS, **app.config["SQLITE_PRAGMAS"]})
+        app.extensions["sqlite_writer"] = GroupCommitWriter(
+            app,
+            db.session,
+            max_batch=app.config["SQLITE_GROUP_COMMIT_MAX_BATCH"],
+            window_seconds=app.config["SQLITE_GROUP_COMMIT_WINDOW_SECONDS"],
+        )
+
+    if app.config["SQLALCHEMY_REPLICA_URIS"]:
+        app.extensions["replica_router"] = ReplicaRouter(
+            app.config["SQLALCHEMY_REPLICA_URIS"],
+            sticky_seconds=app.config["REPLICA_STICKY_SECONDS"],
+            health_check_seconds=app.config["REPLICA_HEALTH_CHECK_SECONDS"],
+            engine_options=app.config.get("SQLALCHEMY_ENGINE_OPTIONS"),
+        )
+
+    @app.before_request
+    def route_reads_to_replica():
+        router = app.extensions.get("replica_router")
+        if router is not None and request.method in ("GET", "HEAD"):
+            g.db_read_engine = router.read_engine()
+
+    @app.after_request
+    def keep_writers_on_primary(response):
+        router = app.extensions.get("replica_router")
+        user_id = g.get("current_user_id")
+        if router is not None and user_id and request.method not in ("GET", "HEAD", "OPTIONS"):
+            if response.status_code < 400:
+                router.mark_write(user_id)
+        return response
+
+    @app.teardown_request
+    def forget_shard_user(exc):
+        current_shard_user.set(None)
 
     with app.app_context():
+        configure_sqlite_profile()
         db.create_all()
+        if shard_engines():
+            shard_tables = shard_metadata(db.metadata, SHARDED_TABLES)
+            for engine in shard_engines():
+                shard_tables.create_all(engine)
         bootstrap_schema()
 
     token_serializer = URLSafeTimedSerializer(app.config["SECRET_KEY"])
@@ -172,7 +1466,15 @@ def create_app(config: Optional[Dict] = None):
             user_id = payload.get("user_id")
             if not user_id:
                 return None
-            return User.query.get(user_id)
+            router = app.extensions.get("replica_router")
+            if router is not None and router.is_sticky(user_id):
+                g.db_read_engine = None
+            user = User.query.get(user_id)
+            if user is None and g.get("db_read_engine") is not None:
+                # Freshly signed-up accounts may not have reached the replica yet.
+                g.db_read_engine = None
+                user = User.query.get(user_id)
+            return user
         except (BadSignature, SignatureExpired):
             return None
 
@@ -192,6 +1494,8 @@ def create_app(config: Optional[Dict] = None):
             if not user:
                 return jsonify({"error": "Invalid or expired token"}), 401
             g.current_user = user
+            g.current_user_id = user.id
+            current_shard_user.set(user.id)
             g.auth_token = token
             return fn(*args, **kwargs)
 
@@ -207,7 +1511,7 @@ def create_app(config: Optional[Dict] = None):
             "user": serialize_user(user),
         }
 
-    def parse_expense_payload(payload: Dict) -> Tuple[float, str, date, str]:
+    def parse_expense_payload(payload: Dict) -> Tuple[float, str, date, str, Optional[str]]:
         try:
             amount = float(payload.get("amount", 0))
         except (TypeError, ValueError):
@@ -219,24 +1523,71 @@ def create_app(config: Optional[Dict] = None):
             expense_date = datetime.strptime(date_str, "%Y-%m-%d").date()
         except (TypeError, ValueError):
             expense_date = None
-        return amount, category, expense_date, description
+        currency = (payload.get("currency") or "").strip().upper() or None
+        return amount, category, expense_date, description, currency
 
-    def validate_expense(amount: float, category: str, expense_date: date) -> Tuple[bool, str]:
+    def validate_expense(
+        amount: float, category: str, expense_date: date, currency: Optional[str] = None
+    ) -> Tuple[bool, str]:
         if amount <= 0:
             return False, "Amount must be greater than zero."
         if not category:
             return False, "Category is required."
         if expense_date is None:
             return False, "A valid date (YYYY-MM-DD) is required."
+        if currency and not fx_rates.supports(currency):
+            return False, f"Unsupported currency '{currency}'."
         return True, ""
 
+    def reporting_currency(args) -> Optional[str]:
+        """Currency requested via ``?currency=``, else ``REPORTING_CURRENCY``; ``None`` if unknown."""
+        currency = (args.get("currency") or app.config["REPORTING_CURRENCY"]).strip().upper()
+        return currency if fx_rates.supports(currency) else None
+
+    def unsupported_currency():
+        return jsonify({"error": f"Unsupported currency. Use one of: {', '.join(sorted(fx_rates.currencies))}."}), 400
+
     def build_expense_query(user_id: int):
         return Expense.query.filter(Expense.user_id == user_id)
 
+    def run_write(work):
+        """Run ``work`` and commit, through the SQLite group-commit writer when it is enabled.
+
+        ``work`` must return plain data (dicts, tuples); with the writer it runs on another thread.
+        """
+        user_id = current_shard_user.get()
+        shard_router = app.extensions.get("shard_router")
+        if shard_router is not None and user_id is not None and shard_router.is_moving(user_id):
+            raise ShardMoveInProgress("Your data is being moved to another server.")
+        writer = app.extensions.get("sqlite_writer")
+        if writer is None:
+            result = work()
+            db.session.commit()
+            return result
+
+        def work_on_user_shard():
+            with shard_context(user_id):
+                return work()
+
+        try:
+            return writer.submit(work_on_user_shard)
+        finally:
+            # End this thread's read snapshot so later reads in the request see the new rows.
+            db.session.rollback()
+
     @app.route("/")
     def serve_index():
         return app.send_static_file("index.html")
 
+    def auth_busy(exc: Exception):
+        response = jsonify({"error": f"{exc} Please retry shortly."})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+
+    @app.errorhandler(ShardMoveInProgress)
+    def shard_move_in_progress(exc: ShardMoveInProgress):
+        return auth_busy(exc)
+
     @app.post("/auth/signup")
     def signup():
         data = request.get_json() or {}
@@ -247,14 +1598,18 @@ def create_app(config: Optional[Dict] = None):
             return jsonify({"error": "Email, username, and password are required."}), 400
         if User.query.filter((User.email == email) | (User.username == username)).first():
             return jsonify({"error": "Email or username already registered."}), 400
-        user = User(
-            email=email,
-            username=username,
-            password_hash=generate_password_hash(password),
-        )
-        db.session.add(user)
-        db.session.commit()
-        return jsonify(auth_response(user)), 201
+        try:
+            password_hash = password_hasher.hash(password)
+        except PasswordHasherBusy as exc:
+            return auth_busy(exc)
+
+        def create_user():
+            user = User(email=email, username=username, password_hash=password_hash)
+            db.session.add(user)
+            db.session.flush()
+            return auth_response(user)
+
+        return jsonify(run_write(create_user)), 201
 
     @app.post("/auth/login")
     def login():
@@ -262,8 +1617,20 @@ def create_app(config: Optional[Dict] = None):
         email = (data.get("email") or "").strip().lower()
         password = data.get("password") or ""
         user = User.query.filter_by(email=email).first()
-        if not user or not check_password_hash(user.password_hash, password):
-            return jsonify({"error": "Invalid credentials."}), 401
+        try:
+            if not password_hasher.verify(user.password_hash if user else None, password):
+                return jsonify({"error": "Invalid credentials."}), 401
+            if password_hasher.needs_rehash(user.password_hash):
+                password_hash = password_hasher.hash(password)
+                user_id = user.id
+
+                def upgrade_hash():
+                    db.session.get(User, user_id).password_hash = password_hash
+
+                run_write(upgrade_hash)
+                user = db.session.get(User, user_id)
+        except PasswordHasherBusy as exc:
+            return auth_busy(exc)
         return jsonify(auth_response(user))
 
     @app.get("/me")
@@ -277,65 +1644,265 @@ def create_app(config: Optional[Dict] = None):
         start_date, end_date, category = parse_filters(request.args)
         query = apply_filters(build_expense_query(g.current_user.id), g.current_user.id, start_date, end_date, category)
         expenses = query.order_by(Expense.date.desc(), Expense.id.desc()).all()
+        archived = archived_expenses(g.current_user.id, start_date, end_date, category)
+        if archived:
+            expenses = sorted(expenses + archived, key=lambda exp: (exp.date, exp.id), reverse=True)
         return jsonify([exp.to_dict() for exp in expenses])
 
+    @app.get("/expenses/changes")
+    @auth_required
+    def expense_changes():
+        since = request.args.get("since", default=0, type=int)
+        version = current_sync_version(g.current_user.id)
+        reset = since <= 0 or since > version
+        archived = archived_changes(g.current_user.id, 0 if reset else since)
+        query = build_expense_query(g.current_user.id)
+        deleted: List[int] = []
+        if not reset:
+            query = query.filter(Expense.version > since)
+            deleted = [
+                expense_id
+                for (expense_id,) in db.session.query(ExpenseTombstone.expense_id).filter(
+                    ExpenseTombstone.user_id == g.current_user.id, ExpenseTombstone.version > since
+                )
+            ]
+        expenses = query.order_by(Expense.date.desc(), Expense.id.desc()).all()
+        return jsonify(
+            {
+                "version": version,
+                "reset": reset,
+                "upserts": [exp.to_dict() for exp in expenses]
+                + [dict(exp.to_dict(), archived=True) for exp in archived],
+                "deletes": deleted,
+            }
+        )
+
     @app.post("/expenses")
     @auth_required
     def create_expense():
         payload = request.get_json() or {}
-        amount, category, expense_date, description = parse_expense_payload(payload)
-        is_valid, message = validate_expense(amount, category, expense_date)
+        amount, category, expense_date, description, currency = parse_expense_payload(payload)
+        is_valid, message = validate_expense(amount, category, expense_date, currency)
         if not is_valid:
             return jsonify({"error": message}), 400
-        expense = Expense(
-            user_id=g.current_user.id,
-            amount=round(amount, 2),
-            category=category,
-            description=description,
-            date=expense_date,
-        )
-        db.session.add(expense)
-        db.session.commit()
-        return jsonify(expense.to_dict()), 201
+        user_id = g.current_user.id
+
+        def insert_expense():
+            expense = Expense(
+                user_id=user_id,
+                amount=round(amount, 2),
+                category=category,
+                description=description,
+                date=expense_date,
+                currency=currency or DEFAULT_CURRENCY,
+            )
+            db.session.add(expense)
+            db.session.flush()
+            track_recurring(expense)
+            db.session.flush()
+            return expense.to_dict()
+
+        return jsonify(run_write(insert_expense)), 201
 
     @app.put("/expenses/<int:expense_id>")
     @auth_required
     def update_expense(expense_id: int):
         payload = request.get_json() or {}
-        amount, category, expense_date, description = parse_expense_payload(payload)
-        is_valid, message = validate_expense(amount, category, expense_date)
+        amount, category, expense_date, description, currency = parse_expense_payload(payload)
+        is_valid, message = validate_expense(amount, category, expense_date, currency)
         if not is_valid:
             return jsonify({"error": message}), 400
-        expense = build_expense_query(g.current_user.id).filter_by(id=expense_id).first_or_404()
-        expense.amount = round(amount, 2)
-        expense.category = category
-        expense.description = description
-        expense.date = expense_date
-        db.session.commit()
-        return jsonify(expense.to_dict())
+        user_id = g.current_user.id
+
+        def apply_update():
+            expense = build_expense_query(user_id).filter_by(id=expense_id).first_or_404()
+            previous_category = expense.category
+            expense.amount = round(amount, 2)
+            expense.category = category
+            expense.description = description
+            expense.date = expense_date
+            if currency:
+                expense.currency = currency
+            db.session.flush()
+            rebuild_recurring_series(user_id, category)
+            if previous_category != category:
+                rebuild_recurring_series(user_id, previous_category)
+            db.session.flush()
+            return expense.to_dict()
+
+        return jsonify(run_write(apply_update))
 
     @app.delete("/expenses/<int:expense_id>")
     @auth_required
     def delete_expense(expense_id: int):
-        expense = build_expense_query(g.current_user.id).filter_by(id=expense_id).first_or_404()
-        db.session.delete(expense)
-        db.session.commit()
-        return jsonify({"status": "deleted"})
+        user_id = g.current_user.id
+
+        def remove_expense():
+            expense = build_expense_query(user_id).filter_by(id=expense_id).first_or_404()
+            db.session.delete(expense)
+            db.session.flush()
+            if expense.recurring_series_id is not None:
+                # Unmatched expenses never joined a series, so only members need a replay.
+                rebuild_recurring_series(user_id, expense.category)
+            return {"status": "deleted"}
+
+        return jsonify(run_write(remove_expense))
+
+    @app.get("/recurring")
+    @auth_required
+    def list_recurring():
+        series = RecurringSeries.query.filter(
+            RecurringSeries.user_id == g.current_user.id,
+            RecurringSeries.occurrences >= RECURRING_MIN_OCCURRENCES,
+        ).all()
+        confirmed = sorted(
+            (item for item in series if item.is_confirmed), key=lambda item: item.monthly_amount, reverse=True
+        )
+        return jsonify([item.to_dict() for item in confirmed])
+
+    @app.post("/recurring/rebuild")
+    @auth_required
+    def rebuild_recurring():
+        user_id = g.current_user.id
+        run_write(lambda: rebuild_recurring_series(user_id))
+        return list_recurring()
+
+    @app.get("/budgets")
+    @auth_required
+    def list_budgets():
+        month = request.args.get("month") or date.today().strftime("%Y-%m")
+        try:
+            datetime.strptime(month, "%Y-%m")
+        except ValueError:
+            return jsonify({"error": "Month must use the YYYY-MM format."}), 400
+        return jsonify({"month": month, "budgets": budget_status(g.current_user.id, month)})
+
+    @app.post("/budgets")
+    @auth_required
+    def upsert_budget():
+        payload = request.get_json() or {}
+        category = (payload.get("category") or "").strip()
+        try:
+            limit = float(payload.get("limit", 0))
+        except (TypeError, ValueError):
+            limit = 0.0
+        if not category:
+            return jsonify({"error": "Category is required."}), 400
+        if limit <= 0:
+            return jsonify({"error": "Limit must be greater than zero."}), 400
+        user_id = g.current_user.id
+        month = date.today().strftime("%Y-%m")
+
+        def save_budget():
+            budget = Budget.query.filter_by(user_id=user_id, category=category).first()
+            created = budget is None
+            if created:
+                budget = Budget(user_id=user_id, category=category, monthly_limit=round(limit, 2))
+                db.session.add(budget)
+            else:
+                budget.monthly_limit = round(limit, 2)
+            db.session.flush()
+            current = db.session.get(CategoryMonthTotal, (user_id, category, month))
+            if current is not None:
+                record_budget_alerts(db.session, (user_id, category, month), current.total, 0.0)
+            db.session.flush()
+            status = next(item for item in budget_status(user_id, month) if item["id"] == budget.id)
+            return status, created
+
+        status, created = run_write(save_budget)
+        return jsonify(status), 201 if created else 200
+
+    @app.delete("/budgets/<int:budget_id>")
+    @auth_required
+    def delete_budget(budget_id: int):
+        user_id = g.current_user.id
+
+        def remove_budget():
+            budget = Budget.query.filter_by(user_id=user_id, id=budget_id).first_or_404()
+            db.session.delete(budget)
+            return {"status": "deleted"}
+
+        return jsonify(run_write(remove_budget))
+
+    @app.get("/alerts")
+    @auth_required
+    def list_alerts():
+        query = BudgetAlert.query.filter(BudgetAlert.user_id == g.current_user.id)
+        since = request.args.get("since", type=int)
+        if since:
+            query = query.filter(BudgetAlert.id > since)
+        alerts = query.order_by(BudgetAlert.id.desc()).limit(50).all()
+        return jsonify([alert.to_dict() for alert in alerts])
+
+    def summarize_shard(conn) -> Dict:
+        currency = app.config["REPORTING_CURRENCY"]
+        users = conn.execute(select(func.count(func.distinct(Expense.user_id)))).scalar() or 0
+        columns = (Expense.category, Expense.currency, conversion_day(currency))
+        categories: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+        for category, source, day, count, total in conn.execute(
+            select(*columns, func.count(Expense.id), func.sum(Expense.amount)).group_by(*columns)
+        ):
+            categories[category][0] += count
+            categories[category][1] += (total or 0.0) * group_factor(fx_rates, source, day, currency)
+        return {"users": users, "categories": [(category, *totals) for category, totals in categories.items()]}
+
+    @app.get("/admin/summary")
+    @auth_required
+    def admin_summary():
+        if g.current_user.email not in app.config["ADMIN_EMAILS"]:
+            return jsonify({"error": "Admin access required."}), 403
+        shard_router = app.extensions.get("shard_router")
+        if shard_router is not None:
+            results = shard_router.fan_out(summarize_shard)
+        else:
+            with db.engine.connect() as conn:
+                results = {"default": summarize_shard(conn)}
+        category_totals: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+        shards = []
+        for name, result in sorted(results.items()):
+            shard_count = sum(count for _, count, _ in result["categories"])
+            shard_total = sum(total for _, _, total in result["categories"])
+            for category, count, total in result["categories"]:
+                category_totals[category][0] += count
+                category_totals[category][1] += total
+            shards.append(
+                {"shard": name, "users": result["users"], "expenses": shard_count, "total": round(shard_total, 2)}
+            )
+        return jsonify(
+            {
+                "currency": app.config["REPORTING_CURRENCY"],
+                "shards": shards,
+                "users": sum(shard["users"] for shard in shards),
+                "expenses": sum(shard["expenses"] for shard in shards),
+                "totalSpent": round(sum(shard["total"] for shard in shards), 2),
+                "categoryTotals": [
+                    {"category": category, "count": count, "total": round(total, 2)}
+                    for category, (count, total) in sorted(
+                        category_totals.items(), key=lambda item: item[1][1], reverse=True
+                    )
+                ],
+            }
+        )
 
     @app.get("/expenses/stats")
     @auth_required
     def expense_stats():
         start_date, end_date, category = parse_filters(request.args)
+        currency = reporting_currency(request.args)
+        if currency is None:
+            return unsupported_currency()
         query = apply_filters(build_expense_query(g.current_user.id), g.current_user.id, start_date, end_date, category)
-        expenses = query.all()
+        rows = list(converted_rows(query, [Expense.category], fx_rates, currency))
+        rows.extend(archived_converted_rows(g.current_user.id, start_date, end_date, category, fx_rates, currency))
         totals_by_category: Dict[str, float] = defaultdict(float)
-        for expense in expenses:
-            totals_by_category[expense.category] += expense.amount
+        for expense_category, _, amount in rows:
+            totals_by_category[expense_category] += amount
         monthly_trend = [
             {"month": key, "total": round(total, 2)}
-            for key, total in aggregate_monthly_expenses(expenses)
+            for key, total in aggregate_monthly_expenses(rows)
         ]
         response = {
+            "currency": currency,
             "totalSpent": round(sum(totals_by_category.values()), 2),
             "categoryTotals": [
                 {"category": cat, "total": round(total, 2)}
@@ -344,12 +1911,38 @@ def create_app(config: Optional[Dict] = None):
                 )
             ],
             "monthlyTrend": monthly_trend,
+            "budgets": budget_status(g.current_user.id, date.today().strftime("%Y-%m")),
         }
         return jsonify(response)
 
+    @app.get("/expenses/analytics")
+    @auth_required
+    def expense_analytics():
+        dimensions, metrics, error = parse_analytics_request(request.args)
+        if error:
+            return jsonify({"error": error}), 400
+        currency = reporting_currency(request.args)
+        if currency is None:
+            return unsupported_currency()
+        start_date, end_date, category = parse_filters(request.args)
+        query = apply_filters(build_expense_query(g.current_user.id), g.current_user.id, start_date, end_date, category)
+        dialect = db.session.get_bind(mapper=Expense.__mapper__).dialect.name
+        archived = partial(archived_analytics_groups, g.current_user.id, start_date, end_date, category)
+        return jsonify(
+            {
+                "currency": currency,
+                "groupBy": dimensions,
+                "metrics": metrics,
+                "rows": run_analytics(query, dimensions, metrics, dialect, fx_rates, currency, archived),
+            }
+        )
+
     @app.get("/expenses/monthly")
     @auth_required
     def current_month_expenses():
+        currency = reporting_currency(request.args)
+        if currency is None:
+            return unsupported_currency()
         month_param = request.args.get("month")
         today = date.today()
         if month_param:
@@ -369,37 +1962,45 @@ def create_app(config: Optional[Dict] = None):
             .order_by(Expense.date.desc())
             .all()
         )
-        total = round(sum(exp.amount for exp in expenses), 2)
-        month_label = date(year, month, 1).strftime("%B %Y")
+        month_start = date(year, month, 1)
+        month_end = date(year, month, monthrange(year, month)[1])
+        archived = archived_expenses(g.current_user.id, month_start, month_end, None)
+        if archived:
+            expenses = sorted(expenses + archived, key=lambda exp: exp.date, reverse=True)
+        total = round(
+            sum(fx_rates.convert(exp.amount, exp.currency or DEFAULT_CURRENCY, currency, exp.date) for exp in expenses),
+            2,
+        )
+        month_label = month_start.strftime("%B %Y")
         return jsonify(
             {
                 "month": month_label,
+                "currency": currency,
                 "total": total,
                 "count": len(expenses),
                 "expenses": [exp.to_dict() for exp in expenses],
+                "budgets": budget_status(g.current_user.id, f"{year}-{month:02d}"),
             }
         )
 
     @app.get("/expenses/export")
     @auth_required
     def export_expenses():
+        currency = reporting_currency(request.args)
+        if currency is None:
+            return unsupported_currency()
         start_date, end_date, category = parse_filters(request.args)
         query = apply_filters(build_expense_query(g.current_user.id), g.current_user.id, start_date, end_date, category)
         expenses = query.order_by(Expense.date.desc()).all()
+        archived = archived_expenses(g.current_user.id, start_date, end_date, category)
+        if archived:
+            expenses = sorted(expenses + archived, key=lambda exp: exp.date, reverse=True)
 
         buffer = io.StringIO()
         writer = csv.writer(buffer)
-        writer.writerow(["id", "date", "category", "description", "amount"])
+        writer.writerow(export_header(currency))
         for expense in expenses:
-            writer.writerow(
-                [
-                    expense.id,
-                    expense.date.isoformat(),
-                    expense.category,
-                    expense.description or "",
-                    f"{expense.amount:.2f}",
-                ]
-            )
+            writer.writerow(export_row(expense, fx_rates, currency))
         buffer.seek(0)
         filename = f"expenses_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
         response = Response(buffer.getvalue(), mimetype="text/csv")
@@ -466,12 +2067,13 @@ def create_app(config: Optional[Dict] = None):
         return max(prediction, 0.0)
 
     def categorize_spender(amount: float) -> Tuple[str, str]:
-        if amount < 500:
+        budget_conscious_below, average_below = app.config["SPENDER_THRESHOLDS"]
+        if amount < budget_conscious_below:
             return (
                 "Budget-Conscious",
                 "Great discipline! Direct the surplus to savings or investments.",
             )
-        if amount < 1500:
+        if amount < average_below:
             return (
                 "Average",
                 "You're on track. Review discretionary categories to free 5-10% for savings.",
@@ -481,22 +2083,171 @@ def create_app(config: Optional[Dict] = None):
             "Spending is trending high. Set weekly limits and automate savings transfers.",
         )
 
+    def build_prediction(user_id: int, currency: str) -> Dict:
+        rows = list(converted_rows(build_expense_query(user_id), [Expense.recurring_series_id], fx_rates, currency))
+        monthly = aggregate_monthly_expenses(rows)
+        today = date.today()
+        active_series = [
+            series
+            for series in RecurringSeries.query.filter(
+                RecurringSeries.user_id == user_id,
+                RecurringSeries.occurrences >= RECURRING_MIN_OCCURRENCES,
+            )
+            if series.is_active(today)
+        ]
+        active_ids = {series.id for series in active_series}
+        series_currency: Dict[int, str] = {}
+        if active_ids:
+            series_currency = dict(
+                build_expense_query(user_id)
+                .filter(Expense.recurring_series_id.in_(active_ids))
+                .with_entities(Expense.recurring_series_id, Expense.currency)
+                .distinct()
+            )
+        recurring_monthly = sum(
+            fx_rates.convert(series.monthly_amount, series_currency.get(series.id) or DEFAULT_CURRENCY, currency, today)
+            for series in active_series
+        )
+        if active_series:
+            # Forecast the discretionary remainder and add back the committed recurring spend,
+            # so a steady subscription does not look like a trend to the regression.
+            discretionary = aggregate_monthly_expenses([row for row in rows if row[0] not in active_ids])
+            prediction = round(predict_next_month(discretionary) + recurring_monthly, 2)
+        else:
+            prediction = round(predict_next_month(monthly), 2)
+        label, suggestion = categorize_spender(prediction)
+        trailing_average = round(mean([total for _, total in monthly[-3:]]) if monthly else 0.0, 2)
+        return {
+            "currency": currency,
+            "predictedAmount": prediction,
+            "spenderType": label,
+            "suggestion": suggestion,
+            "recentAverage": trailing_average,
+            "recurringMonthly": round(recurring_monthly, 2),
+            "recurringSeries": len(active_series),
+            "dataPoints": monthly,
+        }
+
     @app.get("/predict")
     @auth_required
     def predict_spending():
-        expenses = build_expense_query(g.current_user.id).all()
-        monthly = aggregate_monthly_expenses(expenses)
-        prediction = round(predict_next_month(monthly), 2)
-        label, suggestion = categorize_spender(prediction)
-        trailing_average = round(mean([total for _, total in monthly[-3:]]) if monthly else 0.0, 2)
-        return jsonify(
-            {
-                "predictedAmount": prediction,
-                "spenderType": label,
-                "suggestion": suggestion,
-                "recentAverage": trailing_average,
-                "dataPoints": monthly,
-            }
+        currency = reporting_currency(request.args)
+        if currency is None:
+            return unsupported_currency()
+        return jsonify(build_prediction(g.current_user.id, currency))
+
+    def run_export_job(job, report):
+        params = json.loads(job.params or "{}")
+        currency = reporting_currency(params) or app.config["REPORTING_CURRENCY"]
+        start_date, end_date, category = parse_filters(params)
+        query = apply_filters(build_expense_query(job.user_id), job.user_id, start_date, end_date, category)
+        total = query.count()
+        os.makedirs(app.config["JOB_RESULT_DIR"], exist_ok=True)
+        path = os.path.join(app.config["JOB_RESULT_DIR"], f"{job.id}.csv")
+        with open(f"{path}.part", "w", newline="") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(export_header(currency))
+            rows = query.order_by(Expense.date.desc(), Expense.id.desc()).yield_per(EXPORT_BATCH_SIZE)
+            for index, expense in enumerate(rows, start=1):
+                writer.writerow(export_row(expense, fx_rates, currency))
+                if index % EXPORT_BATCH_SIZE == 0:
+                    report(index * 100 / total)
+            # Archived months lie behind the archive horizon, so they follow the hot rows.
+            archived = archived_expenses(job.user_id, start_date, end_date, category)
+            for expense in sorted(archived, key=lambda exp: (exp.date, exp.id), reverse=True):
+                writer.writerow(export_row(expense, fx_rates, currency))
+            total += len(archived)
+        os.replace(f"{path}.part", path)
+        return {"rows": total}, path
+
+    def run_rollup_job(job, report):
+        user_id = job.user_id
+
+        def rebuild():
+            lock_sync_version(db.session, user_id)
+            rebuild_category_totals(user_id)
+            return CategoryMonthTotal.query.filter(CategoryMonthTotal.user_id == user_id).count()
+
+        return {"rows": run_write(rebuild)}, None
+
+    def run_forecast_job(job, report):
+        params = json.loads(job.params or "{}")
+        return build_prediction(job.user_id, reporting_currency(params) or app.config["REPORTING_CURRENCY"]), None
+
+    app.extensions["job_queue"] = JobQueue(
+        app,
+        db,
+        Job,
+        {"export": run_export_job, "rollup": run_rollup_job, "forecast": run_forecast_job},
+        workers=app.config["JOB_WORKERS"],
+        poll_seconds=app.config["JOB_POLL_SECONDS"],
+        result_dir=app.config["JOB_RESULT_DIR"],
+        result_ttl_seconds=app.config["JOB_RESULT_TTL_SECONDS"],
+    )
+    # Jobs queued before a restart run without waiting for the next enqueue or status poll.
+    app.extensions["job_queue"].start()
+
+    def enqueue_job(kind: str, params: Dict):
+        user_id = g.current_user.id
+
+        def insert_job():
+            job = Job(id=uuid4().hex, user_id=user_id, kind=kind, params=json.dumps(params))
+            db.session.add(job)
+            db.session.flush()
+            return job.to_dict()
+
+        payload = run_write(insert_job)
+        app.extensions["job_queue"].notify()
+        return jsonify(payload), 202
+
+    @app.post("/jobs/export")
+    @auth_required
+    def create_export_job():
+        source = request.get_json(silent=True) or request.args
+        if reporting_currency(source) is None:
+            return unsupported_currency()
+        params = {key: source.get(key) for key in ("start_date", "end_date", "category", "currency") if source.get(key)}
+        return enqueue_job("export", params)
+
+    @app.post("/jobs/rollup")
+    @auth_required
+    def create_rollup_job():
+        return enqueue_job("rollup", {})
+
+    @app.post("/jobs/forecast")
+    @auth_required
+    def create_forecast_job():
+        source = request.get_json(silent=True) or request.args
+        if reporting_currency(source) is None:
+            return unsupported_currency()
+        return enqueue_job("forecast", {"currency": source["currency"]} if source.get("currency") else {})
+
+    @app.get("/jobs")
+    @auth_required
+    def list_jobs():
+        jobs = Job.query.filter(Job.user_id == g.current_user.id).order_by(Job.created_at.desc()).limit(20).all()
+        return jsonify([job.to_dict() for job in jobs])
+
+    @app.get("/jobs/<job_id>")
+    @auth_required
+    def get_job(job_id: str):
+        job = Job.query.filter_by(id=job_id, user_id=g.current_user.id).first_or_404()
+        return jsonify(job.to_dict())
+
+    @app.get("/jobs/<job_id>/result")
+    @auth_required
+    def get_job_result(job_id: str):
+        job = Job.query.filter_by(id=job_id, user_id=g.current_user.id).first_or_404()
+        if job.status != JOB_DONE or not job.result_path:
+            return jsonify({"error": "Job has no downloadable result yet."}), 409
+        if not os.path.exists(job.result_path):
+            return jsonify({"error": "Result file has expired."}), 410
+        return send_file(
+            job.result_path,
+            mimetype="text/csv",
+            as_attachment=True,
+            download_name=f"expenses_{job.id}.csv",
+            conditional=True,
         )
 
     return app
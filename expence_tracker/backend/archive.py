@@ -0,0 +1,141 @@
+"""Move finalized months of old expenses into compressed per-user archive partitions.
+
+    python archive.py run                            # all users, ARCHIVE_HORIZON_MONTHS (default 24)
+    python archive.py run --user 7 --horizon-months 12
+    python archive.py run --dry-run                  # count what would move
+    python archive.py status                         # archived months/rows/bytes per shard
+
+Every month that ends before the horizon becomes one ``expense_archives`` row per user. The API
+reads archived months next to the hot table whenever a date filter reaches back that far. Rows are
+removed from ``expenses`` with plain SQL, so the running category totals, sync versions and
+tombstones stay as they are: to a client the rows still exist, they just moved. A full resync of
+``/expenses/changes`` returns archived rows flagged ``"archived": true``. Archived expenses are
+read-only and leave their recurring series (series are replayed from hot rows only). A late
+expense dated inside an archived month stays hot until the next run merges it into that month's
+partition.
+"""
+
+import argparse
+import os
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, select
+
+# CLI runs must not claim background jobs they may exit in the middle of.
+os.environ.setdefault("JOB_WORKERS", "0")
+
+from app import (
+    Expense,
+    ExpenseArchive,
+    User,
+    create_app,
+    db,
+    pack_archive_rows,
+    summarize_archive_rows,
+    unpack_archive_rows,
+)
+from sharding import shard_context
+
+DELETE_BATCH_SIZE = 500
+
+
+def archive_cutoff(today: date, horizon_months: int) -> date:
+    """First day of the oldest month that stays hot."""
+    index = today.year * 12 + today.month - 1 - horizon_months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def archive_user(user_id: int, cutoff: date, dry_run: bool = False) -> Dict[str, int]:
+    """Archive ``user_id``'s expenses dated before ``cutoff``; returns rows moved per month."""
+    with shard_context(user_id):
+        expenses = (
+            Expense.query.filter(Expense.user_id == user_id, Expense.date < cutoff)
+            .order_by(Expense.date, Expense.id)
+            .all()
+        )
+        by_month: Dict[str, List[Expense]] = defaultdict(list)
+        for expense in expenses:
+            by_month[expense.date.strftime("%Y-%m")].append(expense)
+        moved = {month: len(rows) for month, rows in by_month.items()}
+        if dry_run or not expenses:
+            return moved
+
+        for month, rows in sorted(by_month.items()):
+            archive = ExpenseArchive.query.filter_by(user_id=user_id, month=month).first()
+            if archive is None:
+                archive = ExpenseArchive(user_id=user_id, month=month)
+                db.session.add(archive)
+            else:
+                rows = unpack_archive_rows(archive.payload, user_id) + rows
+            archive.payload = pack_archive_rows(rows)
+            archive.summary = summarize_archive_rows(rows)
+            archive.row_count = len(rows)
+            archive.version = max(row.version or 0 for row in rows)
+        db.session.flush()
+
+        table = Expense.__table__
+        ids = [expense.id for expense in expenses]
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            db.session.execute(delete(table).where(table.c.id.in_(ids[start : start + DELETE_BATCH_SIZE])))
+        db.session.commit()
+        # The ORM copies of the moved rows are gone from the table; don't hand them out again.
+        db.session.expunge_all()
+        return moved
+
+
+def archive_all(app, horizon_months: Optional[int] = None, user_id: Optional[int] = None, dry_run: bool = False):
+    horizon = app.config["ARCHIVE_HORIZON_MONTHS"] if horizon_months is None else horizon_months
+    cutoff = archive_cutoff(date.today(), horizon)
+    user_ids = [user_id] if user_id is not None else [uid for (uid,) in db.session.query(User.id).order_by(User.id)]
+    results = {}
+    for uid in user_ids:
+        moved = archive_user(uid, cutoff, dry_run=dry_run)
+        if moved:
+            results[uid] = moved
+    return cutoff, results
+
+
+def summarize_archives(conn) -> Dict[str, int]:
+    table = ExpenseArchive.__table__
+    months, rows, size = conn.execute(
+        select(func.count(table.c.id), func.sum(table.c.row_count), func.sum(func.length(table.c.payload)))
+    ).one()
+    return {"months": months or 0, "rows": rows or 0, "bytes": size or 0}
+
+
+def archive_status(app) -> Dict[str, Dict[str, int]]:
+    shard_router = app.extensions.get("shard_router")
+    if shard_router is not None:
+        return shard_router.fan_out(summarize_archives)
+    with db.engine.connect() as conn:
+        return {"default": summarize_archives(conn)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old expenses into compressed monthly partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Archive months older than the horizon")
+    run.add_argument("--user", type=int, help="Only archive this user")
+    run.add_argument("--horizon-months", type=int, help="Override ARCHIVE_HORIZON_MONTHS")
+    run.add_argument("--dry-run", action="store_true")
+    commands.add_parser("status", help="Archived months, rows and compressed bytes per shard")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.command == "run":
+            cutoff, results = archive_all(app, args.horizon_months, args.user, dry_run=args.dry_run)
+            verb = "Would archive" if args.dry_run else "Archived"
+            for uid, moved in results.items():
+                print(f"user {uid}: {verb.lower()} {sum(moved.values())} expenses in {len(moved)} months")
+            total = sum(sum(moved.values()) for moved in results.values())
+            print(f"{verb} {total} expenses dated before {cutoff.isoformat()}.")
+        else:
+            for name, summary in sorted(archive_status(app).items()):
+                print(f"{name}: {summary['months']} months, {summary['rows']} expenses, {summary['bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Measure dashboard read latency while a burst of logins is in flight.
+
+Usage (from expence_tracker/backend):
+
+    python benchmarks/auth_mixed_workload.py --logins 8 --reads 200
+
+For each password-hashing mode (inline on the request thread vs. the process pool) the script
+starts ``--logins`` threads that log in repeatedly while one reader thread issues ``--reads``
+``GET /expenses/stats`` requests. It reports reader latency percentiles next to a baseline
+taken with no login traffic, plus login throughput.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from statistics import median
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import User, create_app, db  # noqa: E402
+
+
+def percentile(values, rank):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * rank / 100.0)))]
+
+
+def build_app(path: str, workers: int, method: str):
+    app = create_app(
+        {
+            "TESTING": True,
+            "PROPAGATE_EXCEPTIONS": False,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+            "PASSWORD_HASH_METHOD": method,
+            "PASSWORD_HASH_WORKERS": workers,
+            "PASSWORD_HASH_MAX_PENDING": 1024,
+        }
+    )
+    with app.app_context():
+        db.session.add(
+            User(
+                email="bench@example.com",
+                username="bench",
+                password_hash=app.extensions["password_hasher"].hash("bench"),
+            )
+        )
+        db.session.commit()
+    client = app.test_client()
+    response = client.post("/auth/login", json={"email": "bench@example.com", "password": "bench"})
+    headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+    for day in range(1, 29):
+        client.post(
+            "/expenses",
+            json={"amount": 10 * day, "category": "Food", "date": f"2025-06-{day:02d}"},
+            headers=headers,
+        )
+    return app, headers
+
+
+def measure_reads(app, headers, reads: int):
+    client = app.test_client()
+    latencies = []
+    for _ in range(reads):
+        started = time.perf_counter()
+        client.get("/expenses/stats", headers=headers)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def run_mode(label: str, workers: int, method: str, logins: int, reads: int):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app, headers = build_app(os.path.join(tmpdir, "bench.db"), workers, method)
+        baseline = measure_reads(app, headers, reads)
+
+        done = threading.Event()
+        lock = threading.Lock()
+        login_count = [0]
+
+        def login_loop():
+            client = app.test_client()
+            while not done.is_set():
+                client.post("/auth/login", json={"email": "bench@example.com", "password": "bench"})
+                with lock:
+                    login_count[0] += 1
+
+        threads = [threading.Thread(target=login_loop) for _ in range(logins)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        loaded = measure_reads(app, headers, reads)
+        done.set()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        app.extensions["password_hasher"].shutdown()
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    return {
+        "mode": label,
+        "idle p50 ms": round(median(baseline) * 1000, 2),
+        "p50 ms": round(median(loaded) * 1000, 2),
+        "p95 ms": round(percentile(loaded, 95) * 1000, 2),
+        "p99 ms": round(percentile(loaded, 99) * 1000, 2),
+        "logins/s": round(login_count[0] / wall, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard latency under concurrent logins")
+    parser.add_argument("--logins", type=int, default=8, help="Concurrent login threads")
+    parser.add_argument("--reads", type=int, default=200, help="Stats requests issued by the reader")
+    parser.add_argument("--workers", type=int, default=2, help="Hashing processes for the pooled mode")
+    parser.add_argument("--method", default="scrypt", help="werkzeug hash method, e.g. pbkdf2:sha256:600000")
+    args = parser.parse_args()
+
+    rows = [
+        run_mode("inline", 0, args.method, args.logins, args.reads),
+        run_mode(f"pool({args.workers})", args.workers, args.method, args.logins, args.reads),
+    ]
+    columns = list(rows[0].keys())
+    print(" | ".join(f"{column:>11}" for column in columns))
+    for row in rows:
+        print(" | ".join(f"{row[column]!s:>11}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Compare concurrent expense writes under the default and production SQLite profiles.
+
+Usage (from expence_tracker/backend):
+
+    python benchmarks/sqlite_concurrency.py --threads 8 --writes 50
+
+Each profile gets a fresh database file. Every thread logs ``--writes`` expenses through the API
+while one extra thread keeps reading ``/expenses/stats``. The script reports write throughput,
+latency percentiles and the number of failed requests (e.g. "database is locked").
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from statistics import median
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import User, create_app, db  # noqa: E402
+
+
+def percentile(values, rank):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * rank / 100.0)))]
+
+
+def build_app(profile: str, path: str):
+    app = create_app(
+        {
+            "TESTING": True,
+            "PROPAGATE_EXCEPTIONS": False,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+            "SQLITE_PROFILE": profile,
+        }
+    )
+    with app.app_context():
+        db.session.add(
+            User(email="bench@example.com", username="bench", password_hash=generate_password_hash("bench"))
+        )
+        db.session.commit()
+    response = app.test_client().post("/auth/login", json={"email": "bench@example.com", "password": "bench"})
+    return app, {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+
+def run_profile(profile: str, threads: int, writes: int):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app, headers = build_app(profile, os.path.join(tmpdir, "bench.db"))
+        latencies, failures = [], []
+        done = threading.Event()
+        lock = threading.Lock()
+
+        def writer(offset):
+            client = app.test_client()
+            for idx in range(writes):
+                payload = {"amount": 10 + (offset * writes + idx) % 500, "category": "Food", "date": "2025-06-01"}
+                started = time.perf_counter()
+                try:
+                    status = client.post("/expenses", data=json.dumps(payload), headers=headers,
+                                         content_type="application/json").status_code
+                except Exception as exc:  # noqa: BLE001 - count any failure
+                    status = repr(exc)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    if status != 201:
+                        failures.append(status)
+
+        def reader():
+            client = app.test_client()
+            while not done.is_set():
+                client.get("/expenses/stats", headers=headers)
+
+        workers = [threading.Thread(target=writer, args=(offset,)) for offset in range(threads)]
+        background = threading.Thread(target=reader, daemon=True)
+        background.start()
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        wall = time.perf_counter() - started
+        done.set()
+        background.join()
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    total = threads * writes
+    return {
+        "profile": profile,
+        "writes/s": round(total / wall, 1),
+        "p50 ms": round(median(latencies) * 1000, 2),
+        "p95 ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99 ms": round(percentile(latencies, 99) * 1000, 2),
+        "failed": len(failures),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite profile concurrency benchmark")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent writer threads")
+    parser.add_argument("--writes", type=int, default=50, help="Expenses posted per thread")
+    args = parser.parse_args()
+
+    rows = [run_profile(profile, args.threads, args.writes) for profile in ("default", "production")]
+    columns = list(rows[0].keys())
+    print(" | ".join(f"{column:>10}" for column in columns))
+    for row in rows:
+        print(" | ".join(f"{row[column]!s:>10}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
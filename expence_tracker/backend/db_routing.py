@@ -0,0 +1,104 @@
+"""Read/write splitting between a primary database and read replicas.
+
+Sharded tables go to the shard of the user in ``current_shard_user`` (see :mod:`sharding`).
+Other reads (GET/HEAD requests) are sent to a healthy replica, picked round-robin; everything else, and
+anything flushed, goes to the primary. After a user writes, their reads stay on the primary for
+``sticky_seconds`` so they see their own changes even if the replicas lag behind.
+"""
+
+import itertools
+import threading
+import time
+from typing import Dict, Optional, Sequence
+
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, text
+
+from sharding import current_shard_user
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        replica_urls: Sequence[str],
+        sticky_seconds: float = 5.0,
+        health_check_seconds: float = 10.0,
+        engine_options: Optional[Dict] = None,
+    ):
+        self.engines = [create_engine(url, **(engine_options or {})) for url in replica_urls]
+        self.sticky_seconds = sticky_seconds
+        self.health_check_seconds = health_check_seconds
+        self._cycle = itertools.cycle(range(len(self.engines)))
+        self._health: Dict[int, tuple] = {}
+        self._sticky_until: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._probe_locks = [threading.Lock() for _ in self.engines]
+
+    def read_engine(self):
+        """Next healthy replica engine, or ``None`` to fall back to the primary."""
+        for _ in range(len(self.engines)):
+            with self._lock:
+                index = next(self._cycle)
+            if self.is_healthy(index):
+                return self.engines[index]
+        return None
+
+    def is_healthy(self, index: int) -> bool:
+        """Cached probe result; when it expires one caller re-probes while the rest use the last state.
+
+        A replica that is down makes the probe wait for the driver's connect timeout, so only the
+        thread holding the probe lock pays for it (a never-probed replica counts as unhealthy
+        until its first probe finishes).
+        """
+        checked_at, healthy = self._health.get(index, (None, False))
+        if checked_at is not None and time.monotonic() - checked_at < self.health_check_seconds:
+            return healthy
+        probe_lock = self._probe_locks[index]
+        if not probe_lock.acquire(blocking=False):
+            return healthy
+        try:
+            try:
+                with self.engines[index].connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                healthy = True
+            except Exception:  # noqa: BLE001 - any driver error means "not usable right now"
+                healthy = False
+            self._health[index] = (time.monotonic(), healthy)
+        finally:
+            probe_lock.release()
+        return healthy
+
+    def mark_write(self, user_id: int):
+        self._sticky_until[user_id] = time.monotonic() + self.sticky_seconds
+
+    def is_sticky(self, user_id: int) -> bool:
+        until = self._sticky_until.get(user_id)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            self._sticky_until.pop(user_id, None)
+            return False
+        return True
+
+    def dispose(self):
+        for engine in self.engines:
+            engine.dispose()
+
+
+class RoutingSession(Session):
+    """Session that picks the user's shard for sharded tables, else a replica chosen for the request.
+
+    Without a shard router or a current shard user, sharded tables live on the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            shard_router = current_app.extensions.get("shard_router")
+            user_id = current_shard_user.get()
+            if shard_router is not None and user_id is not None and shard_router.owns(mapper, clause):
+                return shard_router.engine_for(user_id)
+            read_engine = g.get("db_read_engine")
+            if read_engine is not None and not self._flushing:
+                return read_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,66 @@
+"""Date-effective FX rates loaded from a local CSV.
+
+The CSV has ``date,currency,rate`` rows, where ``rate`` is the value of one unit of ``currency``
+in the base currency (INR for the bundled ``fx_rates.csv``). A rate applies from its date until
+the next row for the same currency; dates before the first row use the earliest rate. Conversion
+factors are memoized per (source, target, day), so an aggregation that converts once per
+currency/day group pays for each lookup only once.
+"""
+
+import bisect
+import csv
+from collections import defaultdict
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Tuple
+
+FX_BASE_CURRENCY = "INR"
+
+
+class FxRates:
+    def __init__(self, rates: Dict[str, List[Tuple[date, float]]], base_currency: str = FX_BASE_CURRENCY):
+        self.base_currency = base_currency
+        self._dates: Dict[str, List[date]] = {}
+        self._values: Dict[str, List[float]] = {}
+        for currency, points in rates.items():
+            ordered = sorted(points)
+            self._dates[currency] = [day for day, _ in ordered]
+            self._values[currency] = [rate for _, rate in ordered]
+        self.factor = lru_cache(maxsize=65536)(self._factor)
+
+    @property
+    def currencies(self) -> FrozenSet[str]:
+        return frozenset(self._dates) | {self.base_currency}
+
+    def supports(self, currency: str) -> bool:
+        return currency == self.base_currency or currency in self._dates
+
+    def rate(self, currency: str, on: date) -> float:
+        """Value of one unit of ``currency`` in the base currency on ``on``."""
+        if currency == self.base_currency:
+            return 1.0
+        dates = self._dates.get(currency)
+        if not dates:
+            raise ValueError(f"No FX rate for '{currency}'.")
+        index = max(bisect.bisect_right(dates, on) - 1, 0)
+        return self._values[currency][index]
+
+    def _factor(self, source: str, target: str, on: date) -> float:
+        if source == target:
+            return 1.0
+        return self.rate(source, on) / self.rate(target, on)
+
+    def convert(self, amount: float, source: str, target: str, on: date) -> float:
+        if source == target:
+            return amount
+        return amount * self.factor(source, target, on)
+
+
+def load_fx_rates(path: str, base_currency: str = FX_BASE_CURRENCY) -> FxRates:
+    rates: Dict[str, List[Tuple[date, float]]] = defaultdict(list)
+    with open(path, newline="") as handle:
+        for row in csv.DictReader(line for line in handle if not line.startswith("#")):
+            currency = row["currency"].strip().upper()
+            day = datetime.strptime(row["date"].strip(), "%Y-%m-%d").date()
+            rates[currency].append((day, float(row["rate"])))
+    return FxRates(rates, base_currency=base_currency)
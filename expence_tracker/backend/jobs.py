@@ -0,0 +1,182 @@
+"""Database-backed background jobs with an in-process worker pool (no external broker).
+
+Jobs are rows in the ``jobs`` table. Workers claim them with a conditional ``UPDATE`` so several
+processes can share one queue safely. A handler receives the job row plus a ``report(percent)``
+callback and returns ``(result, result_path)``. Result files older than ``result_ttl_seconds``
+are deleted by the workers; downloading one afterwards answers 410.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import select, update
+
+from sharding import shard_context
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+RESULT_SWEEP_SECONDS = 600.0
+
+
+class JobQueue:
+    def __init__(
+        self,
+        app,
+        db,
+        model,
+        handlers: Dict[str, Callable],
+        workers: int = 2,
+        poll_seconds: float = 1.0,
+        stale_seconds: float = 3600.0,
+        result_dir: Optional[str] = None,
+        result_ttl_seconds: float = 86400.0,
+    ):
+        self.app = app
+        self.db = db
+        self.table = model.__table__
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        self.result_dir = result_dir
+        self.result_ttl_seconds = result_ttl_seconds
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def notify(self):
+        """Wake idle workers (starting them on first use) after a job was enqueued."""
+        self.start()
+        self._wakeup.set()
+
+    def start(self):
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            with self.app.app_context():
+                self.requeue_stale()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Ask the worker threads to exit after their current job and wait for them."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            self._stopping.set()
+            self._wakeup.set()
+        for thread in threads:
+            thread.join(timeout)
+        self._stopping.clear()
+
+    def requeue_stale(self):
+        """Put back jobs left ``running`` by a worker that died mid-way."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        with self.db.engine.begin() as conn:
+            conn.execute(
+                update(self.table)
+                .where(self.table.c.status == JOB_RUNNING, self.table.c.started_at < cutoff)
+                .values(status=JOB_QUEUED, progress=0)
+            )
+
+    def sweep_results(self) -> int:
+        """Delete result files older than ``result_ttl_seconds``; returns how many were removed."""
+        if not self.result_dir or not os.path.isdir(self.result_dir):
+            return 0
+        cutoff = time.time() - self.result_ttl_seconds
+        removed = 0
+        for entry in os.scandir(self.result_dir):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:  # another process swept it first
+                    continue
+                removed += 1
+        return removed
+
+    def run_pending(self) -> int:
+        """Drain the queue on the calling thread (used when ``workers`` is 0, e.g. in tests)."""
+        processed = 0
+        while self.run_next():
+            processed += 1
+        return processed
+
+    def run_next(self) -> bool:
+        job = self._claim()
+        if job is None:
+            return False
+        self._execute(job)
+        return True
+
+    def _run(self):
+        next_sweep = 0.0
+        with self.app.app_context():
+            while not self._stopping.is_set():
+                if time.monotonic() >= next_sweep:
+                    next_sweep = time.monotonic() + RESULT_SWEEP_SECONDS
+                    try:
+                        self.sweep_results()
+                    except OSError:
+                        self.app.logger.exception("Job worker could not sweep expired results")
+                try:
+                    worked = self.run_next()
+                except Exception:  # noqa: BLE001 - keep polling through transient DB errors
+                    self.app.logger.exception("Job worker could not poll the queue")
+                    worked = False
+                if not worked:
+                    self._wakeup.wait(self.poll_seconds)
+                    self._wakeup.clear()
+
+    def _claim(self):
+        table = self.table
+        with self.db.engine.begin() as conn:
+            candidates = conn.execute(
+                select(table.c.id).where(table.c.status == JOB_QUEUED).order_by(table.c.created_at).limit(5)
+            ).scalars()
+            for job_id in list(candidates):
+                claimed = conn.execute(
+                    update(table)
+                    .where(table.c.id == job_id, table.c.status == JOB_QUEUED)
+                    .values(status=JOB_RUNNING, started_at=datetime.utcnow())
+                ).rowcount
+                if claimed:
+                    return conn.execute(select(table).where(table.c.id == job_id)).one()
+        return None
+
+    def _set(self, job_id: str, **values):
+        with self.db.engine.begin() as conn:
+            conn.execute(update(self.table).where(self.table.c.id == job_id).values(**values))
+
+    def _execute(self, job):
+        def report(progress: int):
+            self._set(job.id, progress=max(0, min(99, int(progress))))
+
+        handler: Optional[Callable] = self.handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind '{job.kind}'.")
+            with shard_context(job.user_id):
+                result, result_path = handler(job, report)
+        except Exception as exc:  # noqa: BLE001 - recorded on the job for the client to see
+            self.db.session.rollback()
+            self._set(job.id, status=JOB_FAILED, error=str(exc) or exc.__class__.__name__, finished_at=datetime.utcnow())
+        else:
+            self._set(
+                job.id,
+                status=JOB_DONE,
+                progress=100,
+                result=json.dumps(result) if result is not None else None,
+                result_path=result_path,
+                finished_at=datetime.utcnow(),
+            )
+        finally:
+            self.db.session.remove()
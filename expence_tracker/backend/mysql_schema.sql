@@ -22,6 +22,123 @@ CREATE TABLE IF NOT EXISTS expenses (
     category VARCHAR(80) NOT NULL,
     description VARCHAR(255),
     date DATE NOT NULL,
+    currency CHAR(3) NOT NULL DEFAULT 'INR',
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    recurring_series_id INT NULL,
+    updated_at DATETIME NULL,
+    version INT NOT NULL DEFAULT 0,
+    INDEX ix_expenses_recurring_series_id (recurring_series_id),
+    INDEX ix_expenses_user_version (user_id, version),
+    INDEX ix_expenses_user_category_date (user_id, category, date),
     CONSTRAINT fk_expense_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
+
+CREATE TABLE IF NOT EXISTS recurring_series (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    category VARCHAR(80) NOT NULL,
+    description VARCHAR(255),
+    description_key VARCHAR(255) NOT NULL DEFAULT '',
+    amount_bucket INT NOT NULL,
+    mean_amount DOUBLE NOT NULL,
+    occurrences INT NOT NULL DEFAULT 1,
+    period_days DOUBLE NULL,
+    first_date DATE NOT NULL,
+    last_date DATE NOT NULL,
+    INDEX ix_recurring_series_lookup (user_id, category, amount_bucket),
+    CONSTRAINT fk_recurring_series_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS category_month_totals (
+    user_id INT NOT NULL,
+    category VARCHAR(80) NOT NULL,
+    month CHAR(7) NOT NULL,
+    total DOUBLE NOT NULL DEFAULT 0,
+    count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, category, month),
+    CONSTRAINT fk_category_month_totals_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS budgets (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    category VARCHAR(80) NOT NULL,
+    monthly_limit DOUBLE NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_budget_user_category UNIQUE (user_id, category),
+    CONSTRAINT fk_budget_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS budget_alerts (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    category VARCHAR(80) NOT NULL,
+    month CHAR(7) NOT NULL,
+    threshold INT NOT NULL,
+    spent DOUBLE NOT NULL,
+    monthly_limit DOUBLE NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_budget_alerts_user_id (user_id),
+    CONSTRAINT uq_budget_alert_crossing UNIQUE (user_id, category, month, threshold),
+    CONSTRAINT fk_budget_alert_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS sync_versions (
+    user_id INT PRIMARY KEY,
+    version INT NOT NULL DEFAULT 0,
+    CONSTRAINT fk_sync_versions_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS expense_tombstones (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    expense_id INT NOT NULL,
+    version INT NOT NULL,
+    deleted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_expense_tombstones_user_version (user_id, version),
+    CONSTRAINT fk_expense_tombstones_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS shard_directory (
+    user_id INT PRIMARY KEY,
+    shard VARCHAR(64) NOT NULL,
+    moving BOOLEAN NOT NULL DEFAULT FALSE,
+    CONSTRAINT fk_shard_directory_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id CHAR(32) PRIMARY KEY,
+    user_id INT NOT NULL,
+    kind VARCHAR(32) NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'queued',
+    progress INT NOT NULL DEFAULT 0,
+    params TEXT,
+    result TEXT,
+    result_path VARCHAR(512),
+    error TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME NULL,
+    finished_at DATETIME NULL,
+    INDEX ix_jobs_user_id (user_id),
+    INDEX ix_jobs_status_created (status, created_at),
+    CONSTRAINT fk_jobs_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS expense_archives (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    month CHAR(7) NOT NULL,
+    row_count INT NOT NULL DEFAULT 0,
+    payload MEDIUMBLOB NOT NULL,
+    summary MEDIUMTEXT NOT NULL,
+    version INT NOT NULL DEFAULT 0,
+    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_expense_archives_user_month (user_id, month),
+    CONSTRAINT fk_expense_archives_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Primary only: instance-wide settings such as the currency the running totals were built in.
+CREATE TABLE IF NOT EXISTS app_settings (
+    `key` VARCHAR(64) PRIMARY KEY,
+    value VARCHAR(255) NOT NULL
+);
@@ -0,0 +1,102 @@
+"""Password hashing with a configurable method/cost, run in a bounded process pool.
+
+Hashing is deliberately CPU-heavy. Running it in a few worker processes keeps login bursts from
+holding the GIL in the API process, so other endpoints stay responsive; at most ``max_pending``
+hashes may be queued or running before new auth requests are turned away, and a hash that misses
+``timeout_seconds`` is reported the same way. With ``workers=0`` hashing runs inline on the calling
+thread (used by tests and one-off scripts).
+
+Workers come from a ``forkserver`` that only preloads this module: forking the API process itself
+would copy its writer/job threads' locks, and re-importing ``__main__`` would build a second app.
+
+``method`` uses werkzeug's syntax, e.g. ``"scrypt:32768:8:1"`` or ``"pbkdf2:sha256:600000"``.
+Stored hashes made with other parameters still verify and are flagged by :meth:`needs_rehash`.
+"""
+
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Optional
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when ``max_pending`` hashes are already in flight or a hash timed out."""
+
+
+def _hash(password: str, method: str, salt_length: int) -> str:
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+
+def _verify(password_hash: str, password: str) -> bool:
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        method: str = "scrypt",
+        salt_length: int = 16,
+        workers: int = 2,
+        max_pending: int = 32,
+        timeout_seconds: float = 30.0,
+    ):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self.timeout_seconds = timeout_seconds
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # Verified against when the user does not exist, so unknown emails cost the same time.
+        self._dummy_hash = _hash("", method, salt_length)
+        # werkzeug expands defaults ("scrypt" -> "scrypt:32768:8:1"); compare against the expansion.
+        self._prefix = self._dummy_hash.split("$", 1)[0]
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash: Optional[str], password: str) -> bool:
+        if not password_hash:
+            self._run(_verify, self._dummy_hash, password)
+            return False
+        return self._run(_verify, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        return password_hash.split("$", 1)[0] != self._prefix
+
+    def _run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy("Too many sign-in requests in flight.")
+        try:
+            future = self._executor().submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the task really finishes, not just until this caller stops waiting,
+        # so timed-out hashes still count against ``max_pending``.
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except FutureTimeoutError:
+            raise PasswordHasherBusy("Sign-in is taking too long.") from None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload([__name__])
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                atexit.register(self.shutdown)
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
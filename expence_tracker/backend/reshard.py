@@ -0,0 +1,252 @@
+"""Move users between expense shards.
+
+Typical workflow when adding a shard:
+
+    python reshard.py pin-all              # with the *current* SHARD_DATABASE_URLS
+    # add the new shard to SHARD_DATABASE_URLS and restart the API
+    python reshard.py rebalance --dry-run  # list users whose ring slot changed
+    python reshard.py rebalance            # move them and drop their directory pins
+
+Pinning first keeps every existing user on the shard that holds their data while the ring
+changes underneath them. Moves copy a user's rows to the target shard, repoint the directory and
+then delete the source rows. Expense ids are reassigned on the target; the moved rows get a new
+sync version (with tombstones for the old ids, next to the copied earlier tombstones) so
+delta-sync clients pick up the change. Archived rows draw their new ids from the target's
+``expenses`` sequence too, so a later insert there can't reuse one, and their partitions are
+rewritten with the new ids and version.
+
+While a user is moved their directory row is flagged ``moving`` and every API process answers
+their writes with 503. The copy starts one ``SHARD_DIRECTORY_REFRESH_SECONDS`` after the flag is
+set, so processes with a cached directory have seen it, and the move is aborted if the user's sync
+version on the source changed while the rows were copied.
+"""
+
+import argparse
+import os
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+
+# CLI runs must not claim background jobs they may exit in the middle of.
+os.environ.setdefault("JOB_WORKERS", "0")
+
+from app import (
+    ARCHIVE_COLUMNS,
+    SHARDED_TABLES,
+    ShardAssignment,
+    User,
+    create_app,
+    db,
+    pack_archive_rows,
+    unpack_archive_rows,
+)
+
+
+def shard_tables():
+    return {name: db.metadata.tables[name] for name in SHARDED_TABLES}
+
+
+class MoveAborted(RuntimeError):
+    """The user wrote to the source shard while their rows were being copied."""
+
+
+def sync_version(conn, user_id: int) -> int:
+    table = db.metadata.tables["sync_versions"]
+    return conn.execute(select(table.c.version).where(table.c.user_id == user_id)).scalar() or 0
+
+
+def copy_user_rows(source_conn, target_conn, user_id: int) -> int:
+    """Copy every sharded row of ``user_id``; returns the number of expenses moved."""
+    tables = shard_tables()
+    for table in tables.values():
+        target_conn.execute(delete(table).where(table.c.user_id == user_id))
+
+    def rows(name):
+        table = tables[name]
+        return [dict(row._mapping) for row in source_conn.execute(select(table).where(table.c.user_id == user_id))]
+
+    series_ids: Dict[int, int] = {}
+    for row in rows("recurring_series"):
+        old_id = row.pop("id")
+        result = target_conn.execute(insert(tables["recurring_series"]).values(**row))
+        series_ids[old_id] = result.inserted_primary_key[0]
+
+    version = sync_version(source_conn, user_id) + 1
+    target_conn.execute(insert(tables["sync_versions"]).values(user_id=user_id, version=version))
+    # Earlier deletes keep their versions, so a client that synced before them still learns of them.
+    tombstones = rows("expense_tombstones")
+    for row in tombstones:
+        row.pop("id")
+    if tombstones:
+        target_conn.execute(insert(tables["expense_tombstones"]), tombstones)
+
+    # Archived rows go first: they are inserted one at a time to learn their new ids, then removed
+    # again once the hot rows (which therefore get higher ids) are in.
+    old_ids: List[int] = []
+    reserved_ids: List[int] = []
+    archives = rows("expense_archives")
+    for archive in archives:
+        archive.pop("id")
+        archived = unpack_archive_rows(archive["payload"], user_id)
+        for expense in archived:
+            old_ids.append(expense.id)
+            values = {name: getattr(expense, name) for name in ARCHIVE_COLUMNS if name != "id"}
+            result = target_conn.execute(insert(tables["expenses"]).values(user_id=user_id, **values))
+            expense.id = result.inserted_primary_key[0]
+            expense.version = version
+            reserved_ids.append(expense.id)
+        archive["payload"] = pack_archive_rows(archived)
+        archive["version"] = version
+
+    expenses = rows("expenses")
+    old_ids.extend(row.pop("id") for row in expenses)
+    for row in expenses:
+        row["recurring_series_id"] = series_ids.get(row["recurring_series_id"])
+        row["version"] = version
+    if expenses:
+        target_conn.execute(insert(tables["expenses"]), expenses)
+    if reserved_ids:
+        target_conn.execute(delete(tables["expenses"]).where(tables["expenses"].c.id.in_(reserved_ids)))
+    if old_ids:
+        target_conn.execute(
+            insert(tables["expense_tombstones"]),
+            [{"user_id": user_id, "expense_id": expense_id, "version": version} for expense_id in old_ids],
+        )
+    if archives:
+        target_conn.execute(insert(tables["expense_archives"]), archives)
+
+    for name in ("category_month_totals", "budgets", "budget_alerts"):
+        copied = rows(name)
+        for row in copied:
+            row.pop("id", None)  # surrogate keys are reassigned on the target shard
+        if copied:
+            target_conn.execute(insert(tables[name]), copied)
+    return len(expenses)
+
+
+def delete_user_rows(conn, user_id: int):
+    for table in shard_tables().values():
+        conn.execute(delete(table).where(table.c.user_id == user_id))
+
+
+def set_assignment(app, user_id: int, shard: Optional[str], moving: bool = False):
+    """Persist (or clear, when ``shard`` is the ring slot and no move runs) a directory override."""
+    router = app.extensions["shard_router"]
+    override = None if shard == router.ring_shard(user_id) and not moving else shard
+    existing = db.session.get(ShardAssignment, user_id)
+    if override is None and existing is not None:
+        db.session.delete(existing)
+    elif override is not None and existing is None:
+        db.session.add(ShardAssignment(user_id=user_id, shard=override, moving=moving))
+    elif override is not None:
+        existing.shard = override
+    if override is not None:
+        db.session.get(ShardAssignment, user_id).moving = moving
+    db.session.commit()
+    router.assign(user_id, override, moving=moving)
+
+
+def move_user(app, user_id: int, target: str) -> int:
+    router = app.extensions["shard_router"]
+    if target not in router.engines:
+        raise ValueError(f"Unknown shard '{target}'.")
+    source = router.shard_for(user_id)
+    if source == target:
+        return 0
+    set_assignment(app, user_id, source, moving=True)
+    try:
+        time.sleep(router.directory_refresh_seconds)
+        with router.engines[source].connect() as source_conn, router.engines[target].begin() as target_conn:
+            copied_version = sync_version(source_conn, user_id)
+            moved = copy_user_rows(source_conn, target_conn, user_id)
+            # A fresh connection: the copy's own transaction would keep seeing its snapshot.
+            with router.engines[source].connect() as check_conn:
+                if sync_version(check_conn, user_id) != copied_version:
+                    raise MoveAborted(f"User {user_id} wrote to {source} during the move; nothing was moved.")
+    except BaseException:
+        set_assignment(app, user_id, source)
+        raise
+    set_assignment(app, user_id, target)
+    with router.engines[source].begin() as conn:
+        delete_user_rows(conn, user_id)
+    return moved
+
+
+def pin_all(app) -> int:
+    router = app.extensions["shard_router"]
+    pinned = 0
+    existing = {row.user_id for row in ShardAssignment.query.all()}
+    for (user_id,) in db.session.query(User.id):
+        if user_id not in existing:
+            db.session.add(ShardAssignment(user_id=user_id, shard=router.ring_shard(user_id)))
+            pinned += 1
+    db.session.commit()
+    assignments = ShardAssignment.query.all()
+    router.set_directory(
+        {row.user_id: row.shard for row in assignments}, {row.user_id for row in assignments if row.moving}
+    )
+    return pinned
+
+
+def pending_moves(app) -> List[tuple]:
+    router = app.extensions["shard_router"]
+    moves = []
+    for (user_id,) in db.session.query(User.id).order_by(User.id):
+        current, desired = router.shard_for(user_id), router.ring_shard(user_id)
+        if current != desired:
+            moves.append((user_id, current, desired))
+    return moves
+
+
+def rebalance(app, dry_run: bool = False) -> List[tuple]:
+    moves = pending_moves(app)
+    for user_id, _, desired in moves:
+        if not dry_run:
+            move_user(app, user_id, desired)
+    if not dry_run:
+        # Users already on their ring slot no longer need a pin.
+        router = app.extensions["shard_router"]
+        for assignment in ShardAssignment.query.all():
+            if assignment.shard == router.ring_shard(assignment.user_id):
+                set_assignment(app, assignment.user_id, assignment.shard)
+    return moves
+
+
+def shard_counts(app) -> Dict[str, int]:
+    table = db.metadata.tables["expenses"]
+    return app.extensions["shard_router"].fan_out(
+        lambda conn: conn.execute(select(func.count()).select_from(table)).scalar()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move users between expense shards")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("pin-all", help="Pin every user to their current ring shard")
+    move = commands.add_parser("move", help="Move one user to a shard")
+    move.add_argument("--user", type=int, required=True)
+    move.add_argument("--to", required=True)
+    balance = commands.add_parser("rebalance", help="Move pinned users back onto their ring shard")
+    balance.add_argument("--dry-run", action="store_true")
+    commands.add_parser("status", help="Expense counts per shard")
+    args = parser.parse_args()
+
+    app = create_app()
+    if "shard_router" not in app.extensions:
+        parser.error("SHARD_DATABASE_URLS is not configured.")
+    with app.app_context():
+        if args.command == "pin-all":
+            print(f"Pinned {pin_all(app)} users.")
+        elif args.command == "move":
+            print(f"Moved {move_user(app, args.user, args.to)} expenses for user {args.user} to {args.to}.")
+        elif args.command == "rebalance":
+            for user_id, current, desired in rebalance(app, dry_run=args.dry_run):
+                print(f"user {user_id}: {current} -> {desired}")
+        else:
+            for name, count in sorted(shard_counts(app).items()):
+                print(f"{name}: {count} expenses")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 import argparse
+import os
 import random
 from calendar import monthrange
 from datetime import date
 
-from werkzeug.security import generate_password_hash
+from flask import current_app
 
-from app import Expense, User, create_app, db
+# CLI runs must not claim background jobs they may exit in the middle of.
+os.environ.setdefault("JOB_WORKERS", "0")
+
+from app import Expense, User, create_app, db, rebuild_recurring_series
+from sharding import shard_context
 
 CATEGORIES = [
     "Food",
@@ -55,13 +60,14 @@ def ensure_users(target_count: int) -> list[User]:
     users = User.query.order_by(User.id).all()
     to_create = max(0, target_count - len(users))
     created = []
+    hasher = current_app.extensions["password_hasher"]
     for idx in range(to_create):
         username = f"demo{len(users) + idx + 1}"
         email = f"{username}@example.com"
         user = User(
             email=email,
             username=username,
-            password_hash=generate_password_hash("demo123"),
+            password_hash=hasher.hash("demo123"),
         )
         db.session.add(user)
         created.append(user)
@@ -90,6 +96,8 @@ def seed_expenses_for_user(user: User, months: int, per_month: int):
                 date=exp_date,
             )
             db.session.add(expense)
+    db.session.flush()
+    rebuild_recurring_series(user.id)
     db.session.commit()
 
 
@@ -108,7 +116,8 @@ def main():
     with app.app_context():
         users = ensure_users(args.users)
         for user in users:
-            seed_expenses_for_user(user, args.months, args.per_month)
+            with shard_context(user.id):
+                seed_expenses_for_user(user, args.months, args.per_month)
         print(
             f"Seeded {len(users)} users with ~{args.months * args.per_month} expenses each."
         )
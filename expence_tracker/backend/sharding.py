@@ -0,0 +1,156 @@
+"""Horizontal sharding of per-user tables by ``user_id``.
+
+Users live on a consistent-hash ring of named shards; a small directory (``shard_directory``
+table on the primary database) overrides the ring for users that were moved. The shard of the
+current request is carried in a context variable so the session can pick the right engine
+without threading a parameter through every query.
+"""
+
+import bisect
+import contextvars
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import ForeignKeyConstraint, MetaData, create_engine, inspect
+from sqlalchemy.sql.util import find_tables
+
+class ShardMoveInProgress(RuntimeError):
+    """Raised for writes by a user whose rows are being copied to another shard."""
+
+
+current_shard_user: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("current_shard_user", default=None)
+
+
+def parse_shard_urls(value: str) -> Dict[str, str]:
+    """Parse ``"shard0=sqlite:///a.db,shard1=sqlite:///b.db"`` into a name -> URL mapping."""
+    shards = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, url = item.split("=", 1)
+            shards[name.strip()] = url.strip()
+    return shards
+
+
+@contextmanager
+def shard_context(user_id: Optional[int]):
+    token = current_shard_user.set(user_id)
+    try:
+        yield
+    finally:
+        current_shard_user.reset(token)
+
+
+def shard_metadata(metadata: MetaData, table_names: Iterable[str]) -> MetaData:
+    """Copy of the sharded tables to create on each shard, minus foreign keys to primary-only tables.
+
+    ``users`` only lives on the primary database, so a ``user_id -> users.id`` constraint on a shard
+    would reject every insert on engines that enforce it (InnoDB).
+    """
+    names = frozenset(table_names)
+    shard = MetaData()
+    for name in names:
+        table = metadata.tables[name].to_metadata(shard)
+        for constraint in list(table.constraints):
+            if not isinstance(constraint, ForeignKeyConstraint):
+                continue
+            if constraint.elements[0].target_fullname.split(".")[0] in names:
+                continue
+            table.constraints.discard(constraint)
+            for key in constraint.elements:
+                table.foreign_keys.discard(key)
+                key.parent.foreign_keys.discard(key)
+    return shard
+
+
+def _ring_hash(key: str) -> int:
+    return int(hashlib.md5(key.encode("utf-8")).hexdigest()[:16], 16)
+
+
+class ShardRouter:
+    def __init__(
+        self,
+        shard_urls: Dict[str, str],
+        sharded_tables: Iterable[str],
+        directory_loader: Optional[Callable[[], Tuple[Dict[int, str], Set[int]]]] = None,
+        directory_refresh_seconds: float = 5.0,
+        virtual_nodes: int = 64,
+        engine_options: Optional[Dict] = None,
+    ):
+        self.engines = {name: create_engine(url, **(engine_options or {})) for name, url in shard_urls.items()}
+        self.sharded_tables = frozenset(sharded_tables)
+        self.directory_loader = directory_loader
+        self.directory_refresh_seconds = directory_refresh_seconds
+        self._ring: List[Tuple[int, str]] = sorted(
+            (_ring_hash(f"{name}#{replica}"), name) for name in shard_urls for replica in range(virtual_nodes)
+        )
+        self._ring_keys = [point for point, _ in self._ring]
+        self._directory: Dict[int, str] = {}
+        self._moving: Set[int] = set()
+        self._directory_loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def owns(self, mapper=None, clause=None) -> bool:
+        """Whether a statement targets one of the sharded tables."""
+        if mapper is not None:
+            return inspect(mapper).local_table.name in self.sharded_tables
+        if clause is not None:
+            return any(table.name in self.sharded_tables for table in find_tables(clause, include_crud=True))
+        return False
+
+    def ring_shard(self, user_id: int) -> str:
+        index = bisect.bisect(self._ring_keys, _ring_hash(str(user_id))) % len(self._ring)
+        return self._ring[index][1]
+
+    def shard_for(self, user_id: int) -> str:
+        self._refresh_directory()
+        return self._directory.get(user_id) or self.ring_shard(user_id)
+
+    def is_moving(self, user_id: int) -> bool:
+        self._refresh_directory()
+        return user_id in self._moving
+
+    def engine_for(self, user_id: int):
+        return self.engines[self.shard_for(user_id)]
+
+    def assign(self, user_id: int, shard: Optional[str], moving: bool = False):
+        with self._lock:
+            if shard is None:
+                self._directory.pop(user_id, None)
+            else:
+                self._directory[user_id] = shard
+            if moving:
+                self._moving.add(user_id)
+            else:
+                self._moving.discard(user_id)
+
+    def set_directory(self, directory: Dict[int, str], moving: Iterable[int] = ()):
+        with self._lock:
+            self._directory = dict(directory)
+            self._moving = set(moving)
+            self._directory_loaded_at = time.monotonic()
+
+    def _refresh_directory(self):
+        if self.directory_loader is None:
+            return
+        loaded_at = self._directory_loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.directory_refresh_seconds:
+            return
+        self.set_directory(*self.directory_loader())
+
+    def fan_out(self, query: Callable, max_workers: Optional[int] = None) -> Dict[str, object]:
+        """Run ``query(connection)`` on every shard in parallel and return results by shard name."""
+
+        def run(name):
+            with self.engines[name].connect() as conn:
+                return name, query(conn)
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(self.engines)) as pool:
+            return dict(pool.map(run, self.engines))
+
+    def dispose(self):
+        for engine in self.engines.values():
+            engine.dispose()
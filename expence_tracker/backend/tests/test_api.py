@@ -2,9 +2,10 @@ import json
 import unittest
 from datetime import date
 
+from sqlalchemy import event
 from werkzeug.security import generate_password_hash
 
-from app import Expense, User, create_app, db
+from app import Budget, CategoryMonthTotal, Expense, RecurringSeries, User, create_app, db, sync_rollup_currency
 
 
 class ExpenseApiTestCase(unittest.TestCase):
@@ -15,6 +16,7 @@ class ExpenseApiTestCase(unittest.TestCase):
                 "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
                 "SQLALCHEMY_TRACK_MODIFICATIONS": False,
                 "SECRET_KEY": "test-secret",
+                "JOB_WORKERS": 0,
             }
         )
         self.client = self.app.test_client()
@@ -30,6 +32,7 @@ class ExpenseApiTestCase(unittest.TestCase):
         self.token = self._login()
 
     def tearDown(self):
+        self.app.extensions["password_hasher"].shutdown()
         with self.app.app_context():
             db.session.remove()
             db.drop_all()
@@ -57,6 +60,25 @@ class ExpenseApiTestCase(unittest.TestCase):
             headers=self.auth_headers(),
         )
 
+    def test_login_rehashes_password_with_current_parameters(self):
+        with self.app.app_context():
+            user = User.query.filter_by(email="demo@example.com").first()
+            user.password_hash = generate_password_hash("demo123", method="pbkdf2:sha256:1000")
+            db.session.commit()
+
+        self._login()
+        with self.app.app_context():
+            upgraded = User.query.filter_by(email="demo@example.com").first().password_hash
+        self.assertTrue(upgraded.startswith("scrypt:"))
+        self._login()
+
+        response = self.client.post(
+            "/auth/login",
+            data=json.dumps({"email": "nobody@example.com", "password": "demo123"}),
+            headers={"Content-Type": "application/json"},
+        )
+        self.assertEqual(response.status_code, 401)
+
     def test_create_and_list_expenses(self):
         payload = {
             "amount": 250,
@@ -126,6 +148,298 @@ class ExpenseApiTestCase(unittest.TestCase):
         self.assertIn("predictedAmount", data)
         self.assertIn("spenderType", data)
         self.assertIn("suggestion", data)
+        self.assertIn("recurringMonthly", data)
+
+    def test_analytics_groups_by_month_and_category(self):
+        entries = [
+            {"amount": 100, "category": "Food", "date": "2025-01-06"},
+            {"amount": 50, "category": "Food", "date": "2025-01-20"},
+            {"amount": 70, "category": "Bills", "date": "2025-01-21"},
+            {"amount": 30, "category": "Food", "date": "2025-02-03"},
+        ]
+        for item in entries:
+            self._create_expense(item)
+
+        response = self.client.get(
+            "/expenses/analytics?group_by=month,category&metrics=sum,count,avg",
+            headers=self.auth_headers(),
+        )
+        self.assertEqual(response.status_code, 200)
+        rows = response.get_json()["rows"]
+        self.assertEqual(
+            rows,
+            [
+                {"month": "2025-01", "category": "Bills", "sum": 70, "count": 1, "avg": 70},
+                {"month": "2025-01", "category": "Food", "sum": 150, "count": 2, "avg": 75},
+                {"month": "2025-02", "category": "Food", "sum": 30, "count": 1, "avg": 30},
+            ],
+        )
+
+        weekly = self.client.get(
+            "/expenses/analytics?group_by=week,weekday&metrics=count&category=Food",
+            headers=self.auth_headers(),
+        ).get_json()["rows"]
+        self.assertEqual(
+            [(row["week"], row["weekday"]) for row in weekly],
+            [("2025-01-06", "Monday"), ("2025-01-20", "Monday"), ("2025-02-03", "Monday")],
+        )
+
+    def test_analytics_percentiles_use_inprocess_path(self):
+        for amount in (10, 20, 30, 40, 100):
+            self._create_expense({"amount": amount, "category": "Food", "date": "2025-03-01"})
+
+        response = self.client.get(
+            "/expenses/analytics?group_by=category&metrics=median,p90,max",
+            headers=self.auth_headers(),
+        )
+        self.assertEqual(response.status_code, 200)
+        row = response.get_json()["rows"][0]
+        self.assertEqual(row["median"], 30)
+        self.assertEqual(row["p90"], 76)
+        self.assertEqual(row["max"], 100)
+
+    def test_analytics_convert_every_currency(self):
+        self._create_expense({"amount": 100, "category": "Food", "date": "2025-05-10"})
+        self._create_expense({"amount": 10, "category": "Food", "date": "2025-05-12", "currency": "USD"})
+        self._create_expense({"amount": 2, "category": "Food", "date": "2025-05-20", "currency": "USD"})
+        rates = self.app.extensions["fx_rates"]
+        converted = sorted([100, 10 * rates.rate("USD", date(2025, 5, 12)), 2 * rates.rate("USD", date(2025, 5, 20))])
+
+        response = self.client.get(
+            "/expenses/analytics?group_by=category&metrics=sum,count,avg,min,max", headers=self.auth_headers()
+        ).get_json()
+        self.assertEqual(response["currency"], "INR")
+        row = response["rows"][0]
+        self.assertAlmostEqual(row["sum"], round(sum(converted), 2), places=2)
+        self.assertEqual(row["count"], 3)
+        self.assertAlmostEqual(row["avg"], round(sum(converted) / 3, 2), places=2)
+        self.assertAlmostEqual(row["min"], round(converted[0], 2), places=2)
+        self.assertAlmostEqual(row["max"], round(converted[-1], 2), places=2)
+
+        median = self.client.get(
+            "/expenses/analytics?group_by=category&metrics=median&currency=USD", headers=self.auth_headers()
+        ).get_json()
+        self.assertEqual(median["currency"], "USD")
+        self.assertAlmostEqual(median["rows"][0]["median"], 2, places=2)
+
+    def test_analytics_rejects_unknown_dimension(self):
+        response = self.client.get("/expenses/analytics?group_by=hour", headers=self.auth_headers())
+        self.assertEqual(response.status_code, 400)
+
+    def test_recurring_series_detected_incrementally(self):
+        for month in ("01", "02", "03", "04"):
+            self._create_expense(
+                {"amount": 499, "category": "Entertainment", "date": f"2025-{month}-03", "description": "Streaming subscription"}
+            )
+        self._create_expense({"amount": 1200, "category": "Entertainment", "date": "2025-02-14", "description": "Concert"})
+        self._create_expense({"amount": 80, "category": "Food", "date": "2025-03-03", "description": "Streaming subscription"})
+
+        response = self.client.get("/recurring", headers=self.auth_headers())
+        self.assertEqual(response.status_code, 200)
+        series = response.get_json()
+        self.assertEqual(len(series), 1)
+        self.assertEqual(series[0]["cadence"], "monthly")
+        self.assertEqual(series[0]["occurrences"], 4)
+        self.assertEqual(series[0]["nextExpected"], "2025-05-03")
+
+        # A backdated entry triggers a replay of the category rather than being dropped.
+        self._create_expense(
+            {"amount": 505, "category": "Entertainment", "date": "2024-12-03", "description": "Streaming subscription"}
+        )
+        series = self.client.get("/recurring", headers=self.auth_headers()).get_json()
+        self.assertEqual(series[0]["occurrences"], 5)
+        self.assertEqual(series[0]["firstDate"], "2024-12-03")
+
+    def test_deleting_recurring_member_rebuilds_series(self):
+        ids = []
+        for month in ("01", "02", "03"):
+            response = self._create_expense(
+                {"amount": 999, "category": "Bills", "date": f"2025-{month}-10", "description": "Internet"}
+            )
+            ids.append(response.get_json()["id"])
+        self.assertEqual(len(self.client.get("/recurring", headers=self.auth_headers()).get_json()), 1)
+
+        self.client.delete(f"/expenses/{ids[-1]}", headers=self.auth_headers())
+        self.assertEqual(self.client.get("/recurring", headers=self.auth_headers()).get_json(), [])
+
+    def test_series_row_written_only_at_second_occurrence(self):
+        first = self._create_expense({"amount": 40, "category": "Food", "date": "2025-01-03", "description": "Lunch"})
+        self._create_expense({"amount": 400, "category": "Food", "date": "2025-01-05", "description": "Dinner"})
+        with self.app.app_context():
+            self.assertEqual(RecurringSeries.query.count(), 0)
+            self.assertIsNone(db.session.get(Expense, first.get_json()["id"]).recurring_series_id)
+
+        second = self._create_expense({"amount": 41, "category": "Food", "date": "2025-01-10", "description": "Lunch"})
+        with self.app.app_context():
+            series = RecurringSeries.query.one()
+            self.assertEqual(series.occurrences, 2)
+            members = [db.session.get(Expense, response.get_json()["id"]) for response in (first, second)]
+            self.assertEqual([member.recurring_series_id for member in members], [series.id, series.id])
+
+        self.client.delete(f"/expenses/{second.get_json()['id']}", headers=self.auth_headers())
+        with self.app.app_context():
+            self.assertEqual(RecurringSeries.query.count(), 0)
+            self.assertIsNone(db.session.get(Expense, first.get_json()["id"]).recurring_series_id)
+
+    def _create_budget(self, category, limit):
+        return self.client.post(
+            "/budgets",
+            data=json.dumps({"category": category, "limit": limit}),
+            headers=self.auth_headers(),
+        )
+
+    def test_budget_totals_follow_writes_and_raise_alerts(self):
+        month = date.today().strftime("%Y-%m")
+        self.assertEqual(self._create_budget("Food", 1000).status_code, 201)
+
+        first = self._create_expense({"amount": 500, "category": "Food", "date": f"{month}-01"}).get_json()
+        self._create_expense({"amount": 350, "category": "Food", "date": f"{month}-02"})
+        self.assertEqual(self.client.get("/alerts", headers=self.auth_headers()).get_json()[0]["threshold"], 80)
+
+        self.client.put(
+            f"/expenses/{first['id']}",
+            data=json.dumps({"amount": 900, "category": "Food", "date": f"{month}-01"}),
+            headers=self.auth_headers(),
+        )
+        alerts = self.client.get("/alerts", headers=self.auth_headers()).get_json()
+        self.assertEqual([alert["threshold"] for alert in alerts], [100, 80])
+
+        self.client.delete(f"/expenses/{first['id']}", headers=self.auth_headers())
+        budgets = self.client.get("/budgets", headers=self.auth_headers()).get_json()["budgets"]
+        self.assertEqual(budgets[0]["spent"], 350)
+        self.assertEqual(budgets[0]["status"], "ok")
+
+        stats = self.client.get("/expenses/stats", headers=self.auth_headers()).get_json()
+        self.assertEqual(stats["budgets"][0]["category"], "Food")
+
+    def test_budget_requires_positive_limit(self):
+        response = self._create_budget("Food", 0)
+        self.assertEqual(response.status_code, 400)
+
+    def test_changes_endpoint_returns_deltas_since_version(self):
+        first = self._create_expense({"amount": 40, "category": "Food", "date": "2025-04-01"}).get_json()
+        second = self._create_expense({"amount": 60, "category": "Food", "date": "2025-04-02"}).get_json()
+
+        full = self.client.get("/expenses/changes", headers=self.auth_headers()).get_json()
+        self.assertTrue(full["reset"])
+        self.assertEqual(len(full["upserts"]), 2)
+        version = full["version"]
+
+        self.client.put(
+            f"/expenses/{second['id']}",
+            data=json.dumps({"amount": 65, "category": "Food", "date": "2025-04-02"}),
+            headers=self.auth_headers(),
+        )
+        self.client.delete(f"/expenses/{first['id']}", headers=self.auth_headers())
+        third = self._create_expense({"amount": 15, "category": "Transport", "date": "2025-04-03"}).get_json()
+
+        delta = self.client.get(f"/expenses/changes?since={version}", headers=self.auth_headers()).get_json()
+        self.assertFalse(delta["reset"])
+        self.assertGreater(delta["version"], version)
+        self.assertEqual({row["id"] for row in delta["upserts"]}, {second["id"], third["id"]})
+        self.assertEqual(delta["deletes"], [first["id"]])
+
+        idle = self.client.get(f"/expenses/changes?since={delta['version']}", headers=self.auth_headers()).get_json()
+        self.assertEqual((idle["upserts"], idle["deletes"]), ([], []))
+
+    def test_insert_that_joins_a_series_takes_one_version(self):
+        self._create_expense({"amount": 499, "category": "Bills", "date": "2025-01-05", "description": "Phone plan"})
+        version = self.client.get("/expenses/changes", headers=self.auth_headers()).get_json()["version"]
+
+        statements = []
+        with self.app.app_context():
+            engine = db.engine
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            created = self._create_expense(
+                {"amount": 499, "category": "Bills", "date": "2025-02-05", "description": "Phone plan"}
+            ).get_json()
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        self.assertIsNotNone(created["recurring_series_id"])
+        self.assertEqual(created["version"], version + 1)
+        self.assertEqual(len([sql for sql in statements if sql.startswith("UPDATE sync_versions")]), 1)
+
+    def test_stats_convert_to_reporting_currency(self):
+        self._create_expense({"amount": 100, "category": "Food", "date": "2025-05-10"})
+        created = self._create_expense(
+            {"amount": 10, "category": "Travel", "date": "2025-05-12", "currency": "usd"}
+        ).get_json()
+        self.assertEqual(created["currency"], "USD")
+        usd = self.app.extensions["fx_rates"].rate("USD", date(2025, 5, 12))
+
+        stats = self.client.get("/expenses/stats", headers=self.auth_headers()).get_json()
+        self.assertEqual(stats["currency"], "INR")
+        self.assertAlmostEqual(stats["totalSpent"], round(100 + 10 * usd, 2), places=2)
+        self.assertEqual(stats["categoryTotals"][0]["category"], "Travel")
+
+        in_usd = self.client.get("/expenses/stats?currency=USD", headers=self.auth_headers()).get_json()
+        self.assertAlmostEqual(in_usd["totalSpent"], round(10 + 100 / usd, 2), places=2)
+        monthly = self.client.get("/expenses/monthly?month=2025-05&currency=USD", headers=self.auth_headers())
+        self.assertAlmostEqual(monthly.get_json()["total"], in_usd["totalSpent"], places=2)
+
+        export = self.client.get("/expenses/export?currency=usd", headers=self.auth_headers())
+        lines = export.get_data(as_text=True).strip().splitlines()
+        self.assertEqual(lines[0], "id,date,category,description,amount,currency,amount_usd")
+        self.assertTrue(lines[1].endswith(",10.00,USD,10.00"))
+
+        with self.app.app_context():
+            travel = db.session.get(CategoryMonthTotal, (created["user_id"], "Travel", "2025-05"))
+            self.assertAlmostEqual(travel.total, 10 * usd, places=2)
+
+    def test_changing_reporting_currency_rebuilds_totals_and_limits(self):
+        month = date.today().strftime("%Y-%m")
+        self._create_budget("Food", 1000)
+        created = self._create_expense({"amount": 500, "category": "Food", "date": f"{month}-01"}).get_json()
+        rates = self.app.extensions["fx_rates"]
+        usd = rates.rate("USD", date.today())
+
+        with self.app.app_context():
+            self.app.config["REPORTING_CURRENCY"] = "USD"
+            sync_rollup_currency(rates, "USD")
+            total = db.session.get(CategoryMonthTotal, (created["user_id"], "Food", month))
+            self.assertAlmostEqual(total.total, 500 / usd, places=2)
+            budget = Budget.query.filter_by(user_id=created["user_id"], category="Food").one()
+            self.assertAlmostEqual(budget.monthly_limit, round(1000 / usd, 2), places=2)
+
+            # Already in USD: a second start leaves everything alone.
+            sync_rollup_currency(rates, "USD")
+            self.assertAlmostEqual(db.session.get(Budget, budget.id).monthly_limit, round(1000 / usd, 2), places=2)
+
+    def test_unknown_currency_is_rejected(self):
+        response = self._create_expense({"amount": 5, "category": "Food", "date": "2025-05-10", "currency": "XYZ"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/expenses/stats?currency=XYZ", headers=self.auth_headers())
+        self.assertEqual(response.status_code, 400)
+
+    def test_edit_and_delete_only_resend_the_touched_rows(self):
+        ids = []
+        for day in range(1, 21):
+            payload = {"amount": 100 + day * 37, "category": "Food", "date": f"2025-05-{day:02d}"}
+            ids.append(self._create_expense({**payload, "description": f"Meal {day}"}).get_json()["id"])
+        for month in ("02", "03", "04"):
+            self._create_expense(
+                {"amount": 499, "category": "Food", "date": f"2025-{month}-01", "description": "Meal kit"}
+            )
+        version = self.client.get("/expenses/changes", headers=self.auth_headers()).get_json()["version"]
+
+        self.client.put(
+            f"/expenses/{ids[4]}",
+            data=json.dumps({"amount": 12, "category": "Food", "date": "2025-05-05", "description": "Snack"}),
+            headers=self.auth_headers(),
+        )
+        delta = self.client.get(f"/expenses/changes?since={version}", headers=self.auth_headers()).get_json()
+        self.assertEqual([row["id"] for row in delta["upserts"]], [ids[4]])
+
+        self.client.delete(f"/expenses/{ids[7]}", headers=self.auth_headers())
+        delta = self.client.get(f"/expenses/changes?since={delta['version']}", headers=self.auth_headers()).get_json()
+        self.assertEqual((len(delta["upserts"]), delta["deletes"]), (0, [ids[7]]))
+        self.assertEqual(len(self.client.get("/recurring", headers=self.auth_headers()).get_json()), 1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from werkzeug.security import generate_password_hash
+
+from app import CategoryMonthTotal, Expense, ExpenseArchive, User, create_app, db
+from archive import archive_cutoff, archive_user
+
+
+class ArchiveTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.app = create_app(
+            {
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(self.tmpdir.name, 'expenses.db')}",
+                "SECRET_KEY": "test-secret",
+                "JOB_WORKERS": 0,
+            }
+        )
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            user = User(email="demo@example.com", username="demo", password_hash=generate_password_hash("demo123"))
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+        response = self.client.post(
+            "/auth/login",
+            data=json.dumps({"email": "demo@example.com", "password": "demo123"}),
+            headers={"Content-Type": "application/json"},
+        )
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}", "Content-Type": "application/json"}
+        for payload in (
+            {"amount": 100, "category": "Food", "date": "2022-01-05", "description": "old lunch"},
+            {"amount": 50, "category": "Travel", "date": "2022-01-20", "currency": "USD"},
+            {"amount": 70, "category": "Food", "date": "2022-03-02"},
+            {"amount": 30, "category": "Food", "date": "2025-06-01"},
+        ):
+            self.client.post("/expenses", data=json.dumps(payload), headers=self.headers)
+
+    def tearDown(self):
+        self.app.extensions["password_hasher"].shutdown()
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def _archive(self):
+        with self.app.app_context():
+            return archive_user(self.user_id, date(2023, 1, 1))
+
+    def _get(self, url):
+        return self.client.get(url, headers=self.headers)
+
+    def test_cutoff_counts_whole_months(self):
+        self.assertEqual(archive_cutoff(date(2025, 3, 15), 24), date(2023, 3, 1))
+        self.assertEqual(archive_cutoff(date(2025, 1, 31), 1), date(2024, 12, 1))
+
+    def test_old_months_move_out_of_hot_table_but_reads_are_unchanged(self):
+        before_list = self._get("/expenses").get_json()
+        before_stats = self._get("/expenses/stats").get_json()
+        before_export = self._get("/expenses/export").get_data(as_text=True)
+
+        self.assertEqual(self._archive(), {"2022-01": 2, "2022-03": 1})
+        with self.app.app_context():
+            self.assertEqual(Expense.query.count(), 1)
+            self.assertEqual(ExpenseArchive.query.count(), 2)
+
+        # Archived rows leave their recurring series; everything else reads the same.
+        for row in before_list:
+            if row["date"] < "2023-01-01":
+                row["recurring_series_id"] = None
+        self.assertEqual(self._get("/expenses").get_json(), before_list)
+        self.assertEqual(self._get("/expenses/stats").get_json(), before_stats)
+        self.assertEqual(self._get("/expenses/export").get_data(as_text=True), before_export)
+
+        january = self._get("/expenses?start_date=2022-01-01&end_date=2022-01-31&category=Food").get_json()
+        self.assertEqual([row["description"] for row in january], ["old lunch"])
+        recent = self._get("/expenses?start_date=2025-01-01").get_json()
+        self.assertEqual(len(recent), 1)
+        monthly = self._get("/expenses/monthly?month=2022-03").get_json()
+        self.assertEqual((monthly["count"], monthly["total"]), (1, 70))
+
+    def test_changes_resync_includes_archived_rows(self):
+        version = self._get("/expenses/changes").get_json()["version"]
+        self._archive()
+
+        full = self._get("/expenses/changes").get_json()
+        self.assertEqual(len(full["upserts"]), 4)
+        archived = [row for row in full["upserts"] if row.get("archived")]
+        self.assertEqual(sorted(row["date"] for row in archived), ["2022-01-05", "2022-01-20", "2022-03-02"])
+        self.assertTrue(all(row["recurring_series_id"] is None for row in archived))
+
+        delta = self._get(f"/expenses/changes?since={version}").get_json()
+        self.assertEqual((delta["upserts"], delta["deletes"]), ([], []))
+
+    def test_analytics_include_archived_months(self):
+        urls = [
+            "/expenses/analytics?group_by=month,category&metrics=sum,count,avg",
+            "/expenses/analytics?group_by=year&metrics=sum,min,max",
+            "/expenses/analytics?group_by=category&metrics=median,p90&start_date=2022-01-01",
+        ]
+        before = [self._get(url).get_json() for url in urls]
+        self._archive()
+        self.assertEqual([self._get(url).get_json() for url in urls], before)
+        months = {row["month"] for row in before[0]["rows"]}
+        self.assertEqual(months, {"2022-01", "2022-03", "2025-06"})
+
+    def test_rollups_survive_archival_and_rebuild(self):
+        self._archive()
+        with self.app.app_context():
+            food = db.session.get(CategoryMonthTotal, (self.user_id, "Food", "2022-01"))
+            self.assertEqual((food.total, food.count), (100, 1))
+        self.client.post("/jobs/rollup", headers=self.headers)
+        with self.app.app_context():
+            self.app.extensions["job_queue"].run_pending()
+            food = db.session.get(CategoryMonthTotal, (self.user_id, "Food", "2022-01"))
+            self.assertEqual((food.total, food.count), (100, 1))
+
+    def test_late_rows_merge_into_existing_partition(self):
+        self._archive()
+        self.client.post(
+            "/expenses", data=json.dumps({"amount": 5, "category": "Food", "date": "2022-01-09"}), headers=self.headers
+        )
+        with self.app.app_context():
+            self.assertEqual(archive_user(self.user_id, date(2023, 1, 1)), {"2022-01": 1})
+            partition = ExpenseArchive.query.filter_by(month="2022-01").one()
+            self.assertEqual(partition.row_count, 3)
+        january = self._get("/expenses?start_date=2022-01-01&end_date=2022-01-31").get_json()
+        self.assertEqual([row["amount"] for row in january], [50, 5, 100])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from fx import FxRates, load_fx_rates
+
+
+class FxRatesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.rates = FxRates(
+            {
+                "USD": [(date(2025, 1, 1), 80.0), (date(2025, 7, 1), 85.0)],
+                "EUR": [(date(2025, 1, 1), 90.0)],
+            }
+        )
+
+    def test_rates_are_date_effective(self):
+        self.assertEqual(self.rates.rate("USD", date(2024, 12, 1)), 80.0)
+        self.assertEqual(self.rates.rate("USD", date(2025, 6, 30)), 80.0)
+        self.assertEqual(self.rates.rate("USD", date(2025, 7, 1)), 85.0)
+        self.assertEqual(self.rates.rate("INR", date(2025, 7, 1)), 1.0)
+        with self.assertRaises(ValueError):
+            self.rates.rate("XYZ", date(2025, 7, 1))
+
+    def test_cross_conversion_is_memoized(self):
+        self.assertAlmostEqual(self.rates.convert(10, "USD", "EUR", date(2025, 8, 1)), 10 * 85.0 / 90.0)
+        self.assertEqual(self.rates.convert(10, "EUR", "EUR", date(2025, 8, 1)), 10)
+        self.rates.convert(5, "USD", "EUR", date(2025, 8, 1))
+        self.assertEqual(self.rates.factor.cache_info().hits, 1)
+
+    def test_load_from_csv(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "rates.csv")
+            with open(path, "w") as handle:
+                handle.write("# INR per unit\ndate,currency,rate\n2025-01-01,usd,83.5\n")
+            rates = load_fx_rates(path)
+        self.assertEqual(rates.currencies, {"INR", "USD"})
+        self.assertEqual(rates.rate("USD", date(2025, 3, 1)), 83.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from werkzeug.security import generate_password_hash
+
+from app import Job, User, create_app, db
+
+
+class JobQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.app = self._build_app(workers=0)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.session.add(
+                User(email="demo@example.com", username="demo", password_hash=generate_password_hash("demo123"))
+            )
+            db.session.commit()
+        response = self.client.post(
+            "/auth/login",
+            data=json.dumps({"email": "demo@example.com", "password": "demo123"}),
+            headers={"Content-Type": "application/json"},
+        )
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}", "Content-Type": "application/json"}
+        for day in range(1, 6):
+            self.client.post(
+                "/expenses",
+                data=json.dumps({"amount": day * 10, "category": "Food", "date": f"2025-09-0{day}"}),
+                headers=self.headers,
+            )
+
+    def tearDown(self):
+        self.app.extensions["job_queue"].stop()
+        self.app.extensions["password_hasher"].shutdown()
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def _build_app(self, workers):
+        return create_app(
+            {
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(self.tmpdir.name, 'expenses.db')}",
+                "SECRET_KEY": "test-secret",
+                "JOB_WORKERS": workers,
+                "JOB_POLL_SECONDS": 0.05,
+                "JOB_RESULT_DIR": os.path.join(self.tmpdir.name, "results"),
+            }
+        )
+
+    def _drain(self):
+        with self.app.app_context():
+            return self.app.extensions["job_queue"].run_pending()
+
+    def test_export_job_writes_file_served_with_ranges(self):
+        response = self.client.post(
+            "/jobs/export", data=json.dumps({"start_date": "2025-09-02"}), headers=self.headers
+        )
+        self.assertEqual(response.status_code, 202)
+        job = response.get_json()
+        self.assertEqual(job["status"], "queued")
+
+        self.assertEqual(self._drain(), 1)
+        status = self.client.get(f"/jobs/{job['id']}", headers=self.headers).get_json()
+        self.assertEqual((status["status"], status["progress"]), ("done", 100))
+        self.assertEqual(status["result"], {"rows": 4})
+
+        full = self.client.get(status["resultUrl"], headers=self.headers)
+        self.assertEqual(full.status_code, 200)
+        lines = full.get_data(as_text=True).strip().splitlines()
+        self.assertEqual(lines[0], "id,date,category,description,amount,currency,amount_inr")
+        self.assertEqual(len(lines), 5)
+
+        partial = self.client.get(status["resultUrl"], headers={**self.headers, "Range": "bytes=0-1"})
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.get_data(as_text=True), "id")
+
+    def test_result_not_available_until_job_finishes(self):
+        job = self.client.post("/jobs/export", headers=self.headers).get_json()
+        response = self.client.get(f"/jobs/{job['id']}/result", headers=self.headers)
+        self.assertEqual(response.status_code, 409)
+
+    def test_rollup_and_forecast_jobs(self):
+        rollup = self.client.post("/jobs/rollup", headers=self.headers).get_json()
+        forecast = self.client.post("/jobs/forecast", headers=self.headers).get_json()
+        self.assertEqual(self._drain(), 2)
+
+        self.assertEqual(self.client.get(f"/jobs/{rollup['id']}", headers=self.headers).get_json()["result"], {"rows": 1})
+        result = self.client.get(f"/jobs/{forecast['id']}", headers=self.headers).get_json()["result"]
+        self.assertIn("predictedAmount", result)
+        self.assertEqual(len(self.client.get("/jobs", headers=self.headers).get_json()), 2)
+
+    def test_worker_threads_process_queue(self):
+        self.app.extensions["job_queue"].workers = 1
+        job = self.client.post("/jobs/forecast", headers=self.headers).get_json()
+        deadline = time.monotonic() + 10
+        status = None
+        while time.monotonic() < deadline:
+            status = self.client.get(f"/jobs/{job['id']}", headers=self.headers).get_json()["status"]
+            if status in ("done", "failed"):
+                break
+            time.sleep(0.05)
+        self.assertEqual(status, "done")
+
+
+    def test_restart_runs_jobs_queued_before_it(self):
+        job = self.client.post("/jobs/forecast", headers=self.headers).get_json()
+        restarted = self._build_app(workers=1)
+        try:
+            deadline = time.monotonic() + 10
+            status = None
+            while time.monotonic() < deadline:
+                with restarted.app_context():
+                    status = db.session.get(Job, job["id"]).status
+                    db.session.remove()
+                if status in ("done", "failed"):
+                    break
+                time.sleep(0.05)
+            self.assertEqual(status, "done")
+        finally:
+            restarted.extensions["job_queue"].stop()
+            restarted.extensions["password_hasher"].shutdown()
+            with restarted.app_context():
+                db.engine.dispose()
+
+    def test_expired_results_are_swept(self):
+        job = self.client.post("/jobs/export", headers=self.headers).get_json()
+        self._drain()
+        status = self.client.get(f"/jobs/{job['id']}", headers=self.headers).get_json()
+        queue = self.app.extensions["job_queue"]
+        self.assertEqual(queue.sweep_results(), 0)
+
+        path = os.path.join(self.app.config["JOB_RESULT_DIR"], f"{job['id']}.csv")
+        expired = time.time() - self.app.config["JOB_RESULT_TTL_SECONDS"] - 60
+        os.utime(path, (expired, expired))
+        self.assertEqual(queue.sweep_results(), 1)
+        self.assertEqual(self.client.get(status["resultUrl"], headers=self.headers).status_code, 410)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import threading
+from concurrent.futures import Future
+import unittest
+from unittest import mock
+
+from passwords import PasswordHasher, PasswordHasherBusy
+
+
+class PasswordHasherTestCase(unittest.TestCase):
+    def test_hash_and_verify_in_worker_process(self):
+        hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=1)
+        try:
+            password_hash = hasher.hash("secret")
+            self.assertTrue(password_hash.startswith("pbkdf2:sha256:1000$"))
+            self.assertTrue(hasher.verify(password_hash, "secret"))
+            self.assertFalse(hasher.verify(password_hash, "wrong"))
+            self.assertFalse(hasher.verify(None, "secret"))
+        finally:
+            hasher.shutdown()
+
+    def test_needs_rehash_when_parameters_change(self):
+        old = PasswordHasher(method="pbkdf2:sha256:1000", workers=0)
+        new = PasswordHasher(method="pbkdf2:sha256:2000", workers=0)
+        password_hash = old.hash("secret")
+        self.assertFalse(old.needs_rehash(password_hash))
+        self.assertTrue(new.needs_rehash(password_hash))
+        self.assertTrue(new.verify(password_hash, "secret"))
+        self.assertTrue(PasswordHasher(method="scrypt", workers=0).needs_rehash(password_hash))
+
+    def test_rejects_work_beyond_max_pending(self):
+        hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=1, max_pending=1)
+        pending = Future()
+        with mock.patch.object(hasher, "_executor") as executor:
+            executor.return_value.submit.return_value = pending
+            worker = threading.Thread(target=hasher.hash, args=("secret",))
+            worker.start()
+            while not executor.return_value.submit.called:
+                worker.join(0.01)
+            with self.assertRaises(PasswordHasherBusy):
+                hasher.hash("secret")
+            pending.set_result("hash")
+            worker.join()
+            finished = Future()
+            finished.set_result("hash")
+            executor.return_value.submit.return_value = finished
+            self.assertEqual(hasher.hash("secret"), "hash")
+
+    def test_timeout_reports_busy_and_keeps_the_slot_until_the_task_ends(self):
+        hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=1, max_pending=1, timeout_seconds=0.01)
+        future = Future()
+        with mock.patch.object(hasher, "_executor") as executor:
+            executor.return_value.submit.return_value = future
+            with self.assertRaises(PasswordHasherBusy):
+                hasher.hash("secret")
+            # The timed-out task is still running in the pool, so it still occupies the only slot.
+            with self.assertRaises(PasswordHasherBusy):
+                hasher.hash("secret")
+            future.set_result("hash")
+            finished = Future()
+            finished.set_result("hash")
+            executor.return_value.submit.return_value = finished
+            self.assertEqual(hasher.hash("secret"), "hash")
+
+
+if __name__ == "__main__":
+    unittest.main()
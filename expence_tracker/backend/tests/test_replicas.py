@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from sqlalchemy import create_engine
+from werkzeug.security import generate_password_hash
+
+from app import User, create_app, db
+
+
+class ReplicaRoutingTestCase(unittest.TestCase):
+    """Primary and replica are separate SQLite files; "replication" is done by hand."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.app = create_app(
+            {
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(self.tmpdir.name, 'primary.db')}",
+                "SQLALCHEMY_REPLICA_URIS": [f"sqlite:///{os.path.join(self.tmpdir.name, 'replica.db')}"],
+                "REPLICA_STICKY_SECONDS": 60,
+                "SECRET_KEY": "test-secret",
+                "JOB_WORKERS": 0,
+            }
+        )
+        self.router = self.app.extensions["replica_router"]
+        replica = self.router.engines[0]
+        db.metadata.create_all(replica)
+        password_hash = generate_password_hash("demo123")
+        with self.app.app_context():
+            db.session.add(User(id=1, email="demo@example.com", username="demo", password_hash=password_hash))
+            db.session.commit()
+        with replica.begin() as conn:
+            conn.execute(
+                User.__table__.insert().values(
+                    id=1, email="demo@example.com", username="demo", password_hash=password_hash
+                )
+            )
+        self.client = self.app.test_client()
+        response = self.client.post(
+            "/auth/login",
+            data=json.dumps({"email": "demo@example.com", "password": "demo123"}),
+            headers={"Content-Type": "application/json"},
+        )
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}", "Content-Type": "application/json"}
+
+    def tearDown(self):
+        self.app.extensions["password_hasher"].shutdown()
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        self.router.dispose()
+        self.tmpdir.cleanup()
+
+    def _create_expense(self):
+        return self.client.post(
+            "/expenses",
+            data=json.dumps({"amount": 42, "category": "Food", "date": "2025-07-01"}),
+            headers=self.headers,
+        )
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        self.assertEqual(self.client.get("/expenses", headers=self.headers).get_json(), [])
+        self.assertEqual(self._create_expense().status_code, 201)
+        self.router._sticky_until.clear()
+
+        # The replica has not caught up, so a non-sticky read sees the stale copy.
+        self.assertEqual(self.client.get("/expenses", headers=self.headers).get_json(), [])
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        self._create_expense()
+        listing = self.client.get("/expenses", headers=self.headers).get_json()
+        self.assertEqual(len(listing), 1)
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        self._create_expense()
+        self.router._sticky_until.clear()
+        self.router.engines[0].dispose()
+        self.router.engines[0] = create_engine(f"sqlite:///{os.path.join(self.tmpdir.name, 'missing', 'r.db')}")
+        self.router._health.clear()
+
+        listing = self.client.get("/expenses", headers=self.headers).get_json()
+        self.assertEqual(len(listing), 1)
+
+    def test_only_one_caller_probes_an_expired_replica(self):
+        self.router._health[0] = (time.monotonic() - 60, True)
+        started, release = threading.Event(), threading.Event()
+        original_connect = self.router.engines[0].connect
+
+        def slow_connect():
+            started.set()
+            release.wait(5)
+            raise OSError("replica down")
+
+        self.router.engines[0].connect = slow_connect
+        try:
+            prober = threading.Thread(target=self.router.is_healthy, args=(0,))
+            prober.start()
+            started.wait(5)
+            began = time.monotonic()
+            self.assertTrue(self.router.is_healthy(0))  # last known state, no waiting on the probe
+            self.assertLess(time.monotonic() - began, 1)
+            release.set()
+            prober.join()
+        finally:
+            self.router.engines[0].connect = original_connect
+        self.assertFalse(self.router.is_healthy(0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,272 @@
+import json
+import os
+import tempfile
+import unittest
+from collections import Counter
+from datetime import date
+from unittest import mock
+
+from sqlalchemy import create_engine, func, inspect, select, text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.schema import CreateTable
+from werkzeug.security import generate_password_hash
+
+from app import SHARDED_TABLES, Expense, User, create_app, db
+from archive import archive_user
+import reshard
+from reshard import MoveAborted, move_user, pin_all, rebalance
+from sharding import shard_metadata
+
+
+class ShardingTestCase(unittest.TestCase):
+    """Three SQLite files act as shards; a fourth holds users and the shard directory."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.app = self._build_app(["shard0", "shard1", "shard2"])
+        self.router = self.app.extensions["shard_router"]
+        with self.app.app_context():
+            for idx in range(1, 7):
+                db.session.add(
+                    User(
+                        id=idx,
+                        email=f"user{idx}@example.com",
+                        username=f"user{idx}",
+                        password_hash=generate_password_hash("secret"),
+                    )
+                )
+            db.session.commit()
+        self.client = self.app.test_client()
+        self.tokens = {idx: self._login(idx) for idx in range(1, 7)}
+
+    def tearDown(self):
+        for app in getattr(self, "apps", []):
+            app.extensions["password_hasher"].shutdown()
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+            app.extensions["shard_router"].dispose()
+        self.tmpdir.cleanup()
+
+    def _build_app(self, shards):
+        app = create_app(
+            {
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(self.tmpdir.name, 'primary.db')}",
+                "SHARD_DATABASE_URIS": {
+                    name: f"sqlite:///{os.path.join(self.tmpdir.name, name + '.db')}" for name in shards
+                },
+                "SHARD_DIRECTORY_REFRESH_SECONDS": 0,
+                "ADMIN_EMAILS": ["user1@example.com"],
+                "SECRET_KEY": "test-secret",
+                "JOB_WORKERS": 0,
+            }
+        )
+        self.apps = getattr(self, "apps", []) + [app]
+        return app
+
+    def _login(self, idx):
+        response = self.client.post(
+            "/auth/login",
+            data=json.dumps({"email": f"user{idx}@example.com", "password": "secret"}),
+            headers={"Content-Type": "application/json"},
+        )
+        return response.get_json()["token"]
+
+    def _headers(self, idx):
+        return {"Authorization": f"Bearer {self.tokens[idx]}", "Content-Type": "application/json"}
+
+    def _create_expense(self, idx, amount):
+        return self.client.post(
+            "/expenses",
+            data=json.dumps({"amount": amount, "category": "Food", "date": "2025-08-01"}),
+            headers=self._headers(idx),
+        )
+
+    def _shard_expense_users(self, shard):
+        with self.router.engines[shard].connect() as conn:
+            return Counter(user_id for (user_id,) in conn.execute(select(Expense.user_id)))
+
+    def test_shards_hold_only_sharded_tables_without_user_foreign_keys(self):
+        for engine in self.router.engines.values():
+            self.assertEqual(set(inspect(engine).get_table_names()), set(SHARDED_TABLES))
+            self.assertEqual(inspect(engine).get_foreign_keys("expenses"), [])
+
+        # MySQL/InnoDB enforces foreign keys, so the shard DDL must not point at the primary's users table.
+        for table in shard_metadata(db.metadata, SHARDED_TABLES).sorted_tables:
+            ddl = str(CreateTable(table).compile(dialect=mysql.dialect()))
+            self.assertNotIn("REFERENCES users", ddl)
+
+    def test_column_migrations_run_on_every_shard(self):
+        legacy = create_engine(f"sqlite:///{os.path.join(self.tmpdir.name, 'shard3.db')}")
+        with legacy.begin() as conn:
+            conn.execute(
+                text(
+                    "CREATE TABLE expenses (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, amount FLOAT NOT NULL,"
+                    " category VARCHAR(80) NOT NULL, description VARCHAR(255), date DATE NOT NULL, created_at DATETIME)"
+                )
+            )
+        legacy.dispose()
+
+        app = self._build_app(["shard0", "shard1", "shard2", "shard3"])
+        shard3 = app.extensions["shard_router"].engines["shard3"]
+        columns = {column["name"] for column in inspect(shard3).get_columns("expenses")}
+        self.assertTrue({"recurring_series_id", "updated_at", "version", "currency"} <= columns)
+
+    def test_expenses_land_on_the_users_shard(self):
+        for idx in range(1, 7):
+            self._create_expense(idx, idx * 10)
+            self._create_expense(idx, idx * 10)
+
+        for idx in range(1, 7):
+            shard = self.router.shard_for(idx)
+            self.assertEqual(self._shard_expense_users(shard)[idx], 2)
+            stats = self.client.get("/expenses/stats", headers=self._headers(idx)).get_json()
+            self.assertEqual(stats["totalSpent"], idx * 20)
+        with self.app.app_context():
+            self.assertEqual(db.session.scalar(select(func.count()).select_from(Expense)), 0)
+
+    def test_admin_summary_fans_out_across_shards(self):
+        for idx in range(1, 7):
+            self._create_expense(idx, 100)
+
+        forbidden = self.client.get("/admin/summary", headers=self._headers(2))
+        self.assertEqual(forbidden.status_code, 403)
+        summary = self.client.get("/admin/summary", headers=self._headers(1)).get_json()
+        self.assertEqual(summary["users"], 6)
+        self.assertEqual(summary["expenses"], 6)
+        self.assertEqual(summary["totalSpent"], 600)
+        self.assertEqual([shard["shard"] for shard in summary["shards"]], ["shard0", "shard1", "shard2"])
+
+    def test_admin_summary_converts_to_reporting_currency(self):
+        self._create_expense(1, 100)
+        self.client.post(
+            "/expenses",
+            data=json.dumps({"amount": 10, "category": "Food", "date": "2025-08-01", "currency": "USD"}),
+            headers=self._headers(2),
+        )
+        usd = self.app.extensions["fx_rates"].rate("USD", date(2025, 8, 1))
+
+        summary = self.client.get("/admin/summary", headers=self._headers(1)).get_json()
+        self.assertEqual(summary["currency"], "INR")
+        self.assertAlmostEqual(summary["totalSpent"], round(100 + 10 * usd, 2), places=2)
+        self.assertEqual(summary["categoryTotals"][0]["count"], 2)
+
+    def test_move_user_keeps_data_reachable(self):
+        created = self._create_expense(3, 75).get_json()
+        sync_version = self.client.get("/expenses/changes", headers=self._headers(3)).get_json()["version"]
+        source = self.router.shard_for(3)
+        target = next(name for name in self.router.engines if name != source)
+
+        with self.app.app_context():
+            self.assertEqual(move_user(self.app, 3, target), 1)
+
+        self.assertEqual(self.router.shard_for(3), target)
+        self.assertEqual(self._shard_expense_users(source)[3], 0)
+        listing = self.client.get("/expenses", headers=self._headers(3)).get_json()
+        self.assertEqual([row["amount"] for row in listing], [75])
+        delta = self.client.get(f"/expenses/changes?since={sync_version}", headers=self._headers(3)).get_json()
+        self.assertEqual(delta["deletes"], [created["id"]])
+        self.assertEqual(len(delta["upserts"]), 1)
+
+    def test_move_user_gives_archived_rows_fresh_ids(self):
+        for day in ("2022-01-05", "2022-01-06"):
+            self.client.post(
+                "/expenses",
+                data=json.dumps({"amount": 20, "category": "Rent", "date": day}),
+                headers=self._headers(3),
+            )
+        self._create_expense(3, 75)
+        with self.app.app_context():
+            archive_user(3, date(2023, 1, 1))
+        sync_version = self.client.get("/expenses/changes", headers=self._headers(3)).get_json()["version"]
+        target = next(name for name in self.router.engines if name != self.router.shard_for(3))
+
+        with self.app.app_context():
+            move_user(self.app, 3, target)
+        self._create_expense(3, 5)
+
+        full = self.client.get("/expenses/changes", headers=self._headers(3)).get_json()
+        ids = [row["id"] for row in full["upserts"]]
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(len(set(ids)), 4)
+        self.assertEqual(sum(1 for row in full["upserts"] if row.get("archived")), 2)
+
+        delta = self.client.get(f"/expenses/changes?since={sync_version}", headers=self._headers(3)).get_json()
+        self.assertEqual(len(delta["deletes"]), 3)
+        self.assertEqual(sorted(row["id"] for row in delta["upserts"]), sorted(ids))
+
+    def test_move_user_keeps_earlier_deletes_for_delta_clients(self):
+        for idx in range(1, 7):
+            self._create_expense(idx, idx)
+        first = self._create_expense(3, 40).get_json()
+        self._create_expense(3, 60)
+        sync_version = self.client.get("/expenses/changes", headers=self._headers(3)).get_json()["version"]
+        cache = {row["id"] for row in self.client.get("/expenses", headers=self._headers(3)).get_json()}
+        self.client.delete(f"/expenses/{first['id']}", headers=self._headers(3))
+        source = self.router.shard_for(3)
+        target = next(name for name in self.router.engines if name != source and self._shard_expense_users(name))
+
+        with self.app.app_context():
+            move_user(self.app, 3, target)
+
+        delta = self.client.get(f"/expenses/changes?since={sync_version}", headers=self._headers(3)).get_json()
+        self.assertIn(first["id"], delta["deletes"])
+        cache = (cache - set(delta["deletes"])) | {row["id"] for row in delta["upserts"]}
+        server = {row["id"] for row in self.client.get("/expenses", headers=self._headers(3)).get_json()}
+        self.assertEqual(cache, server)
+
+    def test_writes_are_refused_while_a_user_moves(self):
+        source = self.router.shard_for(3)
+        with self.app.app_context():
+            reshard.set_assignment(self.app, 3, source, moving=True)
+        refused = self._create_expense(3, 10)
+        self.assertEqual(refused.status_code, 503)
+        self.assertEqual(refused.headers["Retry-After"], "1")
+        self.assertEqual(self.client.get("/expenses", headers=self._headers(3)).status_code, 200)
+        self.assertEqual(self._create_expense(4, 10).status_code, 201)
+
+    def test_move_aborts_when_the_source_changes_during_the_copy(self):
+        self._create_expense(3, 75)
+        source = self.router.shard_for(3)
+        target = next(name for name in self.router.engines if name != source)
+        copy_user_rows = reshard.copy_user_rows
+
+        def copy_then_write(source_conn, target_conn, user_id):
+            moved = copy_user_rows(source_conn, target_conn, user_id)
+            # A process that missed the fence writes on the source meanwhile.
+            with self.router.engines[source].begin() as conn:
+                conn.execute(text("UPDATE sync_versions SET version = version + 1 WHERE user_id = 3"))
+            return moved
+
+        with self.app.app_context(), mock.patch.object(reshard, "copy_user_rows", copy_then_write):
+            with self.assertRaises(MoveAborted):
+                move_user(self.app, 3, target)
+
+        self.assertEqual(self.router.shard_for(3), source)
+        self.assertFalse(self.router.is_moving(3))
+        self.assertEqual(self._shard_expense_users(source)[3], 1)
+        self.assertEqual(self._shard_expense_users(target)[3], 0)
+        self.assertEqual(self._create_expense(3, 5).status_code, 201)
+
+    def test_rebalance_after_adding_a_shard(self):
+        for idx in range(1, 7):
+            self._create_expense(idx, idx)
+        with self.app.app_context():
+            pin_all(self.app)
+
+        grown = self._build_app(["shard0", "shard1", "shard2", "shard3"])
+        grown_router = grown.extensions["shard_router"]
+        with grown.app_context():
+            moves = rebalance(grown)
+        self.assertTrue(moves)
+        for user_id, _, desired in moves:
+            self.assertEqual(desired, "shard3")
+        for idx in range(1, 7):
+            with grown_router.engines[grown_router.shard_for(idx)].connect() as conn:
+                count = conn.execute(select(func.count()).select_from(Expense).where(Expense.user_id == idx)).scalar()
+            self.assertEqual(count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+from datetime import date
+from unittest import mock
+
+from sqlalchemy import text
+from werkzeug.security import generate_password_hash
+
+from app import Expense, Job, User, create_app, current_sync_version, db
+from sharding import shard_context
+
+
+class SqliteProductionProfileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.app = create_app(
+            {
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(self.tmpdir.name, 'expenses.db')}",
+                "SECRET_KEY": "test-secret",
+                "JOB_WORKERS": 0,
+                "SQLITE_PROFILE": "production",
+            }
+        )
+        with self.app.app_context():
+            db.session.add(
+                User(email="demo@example.com", username="demo", password_hash=generate_password_hash("demo123"))
+            )
+            db.session.commit()
+        response = self.app.test_client().post(
+            "/auth/login",
+            data=json.dumps({"email": "demo@example.com", "password": "demo123"}),
+            headers={"Content-Type": "application/json"},
+        )
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}", "Content-Type": "application/json"}
+
+    def tearDown(self):
+        self.app.extensions["password_hasher"].shutdown()
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_pragmas_applied_on_connect(self):
+        with self.app.app_context():
+            journal_mode = db.session.execute(text("PRAGMA journal_mode")).scalar()
+            synchronous = db.session.execute(text("PRAGMA synchronous")).scalar()
+            busy_timeout = db.session.execute(text("PRAGMA busy_timeout")).scalar()
+        self.assertEqual(journal_mode, "wal")
+        self.assertEqual(synchronous, 1)
+        self.assertEqual(busy_timeout, 5000)
+
+    def _expense(self, amount):
+        return json.dumps({"amount": amount, "category": "Food", "date": "2025-05-01"})
+
+    def test_concurrent_writes_are_group_committed(self):
+        writer = self.app.extensions["sqlite_writer"]
+        batch_sizes = []
+        commit_batch = writer._commit_batch
+
+        def record_batch(batch):
+            batch_sizes.append(len(batch))
+            commit_batch(batch)
+
+        # Hold the writer on one item until every request below is queued behind it.
+        running, release = threading.Event(), threading.Event()
+
+        def hold_writer():
+            running.set()
+            release.wait(10)
+
+        statuses = []
+
+        def post_expense(amount):
+            response = self.app.test_client().post("/expenses", data=self._expense(amount), headers=self.headers)
+            statuses.append(response.status_code)
+
+        with mock.patch.object(writer, "_commit_batch", record_batch):
+            holder = threading.Thread(target=writer.submit, args=(hold_writer,))
+            holder.start()
+            self.assertTrue(running.wait(10))
+            threads = [threading.Thread(target=post_expense, args=(amount,)) for amount in range(1, 9)]
+            for thread in threads:
+                thread.start()
+            deadline = time.monotonic() + 10
+            while writer._queue.qsize() < len(threads) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            release.set()
+            for thread in [holder, *threads]:
+                thread.join()
+
+        self.assertEqual(statuses, [201] * 8)
+        self.assertEqual(sum(batch_sizes), 9)
+        self.assertGreater(max(batch_sizes[1:]), 1)
+        listing = self.app.test_client().get("/expenses", headers=self.headers).get_json()
+        self.assertEqual(len(listing), 8)
+
+    def test_failed_write_does_not_poison_batch(self):
+        writer = self.app.extensions["sqlite_writer"]
+        with self.app.app_context():
+            user_id = User.query.filter_by(email="demo@example.com").one().id
+
+            def add_expense(amount):
+                expense = Expense(user_id=user_id, amount=amount, category="Food", date=date(2025, 5, 1))
+                db.session.add(expense)
+                db.session.flush()
+                return expense.id
+
+            def failing_work():
+                add_expense(11)
+                raise ValueError("rejected")
+
+            failed, succeeded = Future(), Future()
+            with shard_context(user_id):
+                writer._commit_batch([(failing_work, failed), (lambda: add_expense(22), succeeded)])
+
+            self.assertIsInstance(failed.exception(), ValueError)
+            committed = db.session.get(Expense, succeeded.result())
+            self.assertEqual(committed.amount, 22)
+            self.assertEqual([expense.amount for expense in Expense.query.all()], [22])
+
+    def test_rollup_job_writes_through_the_group_commit_writer(self):
+        client = self.app.test_client()
+        client.post(
+            "/expenses",
+            data=json.dumps({"amount": 10, "category": "Food", "date": "2025-05-01"}),
+            headers=self.headers,
+        )
+        job = client.post("/jobs/rollup", headers=self.headers).get_json()
+        writer = self.app.extensions["sqlite_writer"]
+        with self.app.app_context():
+            user_id = db.session.get(Job, job["id"]).user_id
+            version = current_sync_version(user_id)
+            with mock.patch.object(writer, "submit", wraps=writer.submit) as submit:
+                self.assertEqual(self.app.extensions["job_queue"].run_pending(), 1)
+            self.assertEqual(submit.call_count, 1)
+            self.assertEqual(db.session.get(Job, job["id"]).status, "done")
+            # The rebuild locks the user's version row like a writer but doesn't bump it.
+            self.assertEqual(current_sync_version(user_id), version)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,15 @@ const currency = new Intl.NumberFormat('en-IN', {
   maximumFractionDigits: 2,
 });
 
+const amountFormats = { INR: currency };
+
+function formatAmount(amount, code = 'INR') {
+  if (!amountFormats[code]) {
+    amountFormats[code] = new Intl.NumberFormat('en-IN', { style: 'currency', currency: code, maximumFractionDigits: 2 });
+  }
+  return amountFormats[code].format(amount);
+}
+
 let expenses = [];
 let editingId = null;
 let pieChart = null;
@@ -121,16 +130,32 @@ async function refreshEverything() {
 
 async function refreshExpenses() {
   try {
-    const data = await request('/expenses');
-    expenses = data || [];
+    const cached = getCachedData('expenses');
+    const cachedVersion = getCachedData('expensesVersion');
+    const canApplyDelta = Array.isArray(cached) && Number.isInteger(cachedVersion);
+    const since = canApplyDelta ? cachedVersion : 0;
+    const changes = await request(`/expenses/changes?since=${since}`);
+    if (!changes) return;
+    expenses = changes.reset || !canApplyDelta ? changes.upserts || [] : applyExpenseChanges(cached, changes);
     entriesCount.textContent = expenses.length;
     renderRecent();
     cacheData('expenses', expenses);
+    cacheData('expensesVersion', changes.version);
   } catch (error) {
     console.error(error);
   }
 }
 
+function applyExpenseChanges(current, changes) {
+  const byId = new Map(current.map((expense) => [expense.id, expense]));
+  (changes.deletes || []).forEach((id) => byId.delete(id));
+  (changes.upserts || []).forEach((expense) => byId.set(expense.id, expense));
+  return Array.from(byId.values()).sort((a, b) => {
+    if (a.date !== b.date) return a.date < b.date ? 1 : -1;
+    return b.id - a.id;
+  });
+}
+
 function renderRecent() {
   const latest = expenses.slice(0, 10);
   recentMeta.textContent = `${latest.length} shown of ${expenses.length}`;
@@ -145,7 +170,7 @@ function renderRecent() {
       <td>${formatDate(expense.date)}</td>
       <td>${expense.category}</td>
       <td>${expense.description || '—'}</td>
-      <td>${currency.format(expense.amount)}</td>
+      <td>${formatAmount(expense.amount, expense.currency)}</td>
       <td>
         <div class="actions">
           <button type="button" data-action="edit">Edit</button>
@@ -182,6 +207,7 @@ async function handleSubmit(event) {
 function startEdit(expense) {
   editingId = expense.id;
   form.amount.value = expense.amount;
+  form.currency.value = expense.currency || 'INR';
   form.category.value = expense.category;
   form.date.value = expense.date;
   form.description.value = expense.description || '';
@@ -251,8 +277,8 @@ async function loadStats() {
     const stats = await request(`/expenses/stats${buildFilterQuery()}`);
     if (!stats) return;
     const total = stats.totalSpent || 0;
-    totalSpent.textContent = `${currency.format(total)} spent`;
-    updateCategoryTable(stats.categoryTotals || [], total);
+    totalSpent.textContent = `${formatAmount(total, stats.currency)} spent`;
+    updateCategoryTable(stats.categoryTotals || [], total, stats.currency);
     updatePieChart(stats.categoryTotals || []);
     cacheData('stats', stats);
   } catch (error) {
@@ -269,7 +295,7 @@ function buildFilterQuery() {
   return query ? `?${query}` : '';
 }
 
-function updateCategoryTable(rows, total) {
+function updateCategoryTable(rows, total, code) {
   categoryTable.innerHTML = '';
   if (!rows.length) {
     categoryTable.innerHTML = '<tr><td colspan="3" class="muted">No categories yet</td></tr>';
@@ -280,7 +306,7 @@ function updateCategoryTable(rows, total) {
     const tr = document.createElement('tr');
     tr.innerHTML = `
       <td>${row.category}</td>
-      <td>${currency.format(row.total)}</td>
+      <td>${formatAmount(row.total, code)}</td>
       <td>${share}%</td>
     `;
     categoryTable.appendChild(tr);
@@ -323,9 +349,9 @@ async function loadMonthly() {
     const query = selectedMonth ? `?month=${selectedMonth}` : '';
     const monthly = await request(`/expenses/monthly${query}`);
     if (!monthly) return;
-    heroMonthTotal.textContent = currency.format(monthly.total || 0);
+    heroMonthTotal.textContent = formatAmount(monthly.total || 0, monthly.currency);
     currentMonthLabel.textContent = monthly.month;
-    monthTotal.textContent = currency.format(monthly.total || 0);
+    monthTotal.textContent = formatAmount(monthly.total || 0, monthly.currency);
     monthCount.textContent = `${monthly.count} entries`;
     renderMonthlyList(monthly.expenses || []);
     cacheData('monthly', monthly);
@@ -350,7 +376,7 @@ function renderMonthlyList(list) {
       </div>
       <div>
         <p class="muted">${formatDate(expense.date)}</p>
-        <p>${currency.format(expense.amount)}</p>
+        <p>${formatAmount(expense.amount, expense.currency)}</p>
       </div>
     `;
     monthlyList.appendChild(div);
@@ -545,25 +571,25 @@ function loadCachedDashboard() {
   const cachedStats = getCachedData('stats');
   if (cachedStats) {
     const total = cachedStats.totalSpent || 0;
-    totalSpent.textContent = `${currency.format(total)} spent`;
-    updateCategoryTable(cachedStats.categoryTotals || [], total);
+    totalSpent.textContent = `${formatAmount(total, cachedStats.currency)} spent`;
+    updateCategoryTable(cachedStats.categoryTotals || [], total, cachedStats.currency);
     updatePieChart(cachedStats.categoryTotals || []);
   }
   const cachedMonthly = getCachedData('monthly');
   if (cachedMonthly) {
-    heroMonthTotal.textContent = currency.format(cachedMonthly.total || 0);
+    heroMonthTotal.textContent = formatAmount(cachedMonthly.total || 0, cachedMonthly.currency);
     currentMonthLabel.textContent = cachedMonthly.month || '--';
-    monthTotal.textContent = currency.format(cachedMonthly.total || 0);
+    monthTotal.textContent = formatAmount(cachedMonthly.total || 0, cachedMonthly.currency);
     monthCount.textContent = `${cachedMonthly.count || 0} entries`;
     renderMonthlyList(cachedMonthly.expenses || []);
   }
   const cachedPredict = getCachedData('predict');
   if (cachedPredict) {
-    predictedAmountEl.textContent = currency.format(cachedPredict.predictedAmount || 0);
-    heroPrediction.textContent = currency.format(cachedPredict.predictedAmount || 0);
+    predictedAmountEl.textContent = formatAmount(cachedPredict.predictedAmount || 0, cachedPredict.currency);
+    heroPrediction.textContent = formatAmount(cachedPredict.predictedAmount || 0, cachedPredict.currency);
     spendProfileEl.textContent = cachedPredict.spenderType || '--';
     savingTipEl.textContent = cachedPredict.suggestion || '';
-    recentAverageEl.textContent = currency.format(cachedPredict.recentAverage || 0);
+    recentAverageEl.textContent = formatAmount(cachedPredict.recentAverage || 0, cachedPredict.currency);
   }
 }
 
@@ -571,11 +597,11 @@ async function loadPrediction() {
   try {
     const prediction = await request('/predict');
     if (!prediction) return;
-    predictedAmountEl.textContent = currency.format(prediction.predictedAmount || 0);
-    heroPrediction.textContent = currency.format(prediction.predictedAmount || 0);
+    predictedAmountEl.textContent = formatAmount(prediction.predictedAmount || 0, prediction.currency);
+    heroPrediction.textContent = formatAmount(prediction.predictedAmount || 0, prediction.currency);
     spendProfileEl.textContent = prediction.spenderType || '--';
     savingTipEl.textContent = prediction.suggestion || '';
-    recentAverageEl.textContent = currency.format(prediction.recentAverage || 0);
+    recentAverageEl.textContent = formatAmount(prediction.recentAverage || 0, prediction.currency);
     cacheData('predict', prediction);
   } catch (error) {
     console.error(error);